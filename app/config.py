@@ -5,23 +5,98 @@ from typing import List, Union
 
 class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
+    HOST: str = "0.0.0.0"
     PORT: int = 8000
     
+    # Servidor de producción (serve.py)
+    WEB_CONCURRENCY: int = 0  # 0 = un worker por CPU disponible
+    MAX_REQUESTS: int = 0  # reciclar cada worker tras N requests (0 = nunca)
+    GRACEFUL_TIMEOUT_SECONDS: int = 30
+    
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_DAYS: int = 7
     
     MONGODB_URI: str
+    # Conexiones totales por instancia, repartidas entre los workers
+    MONGODB_MAX_POOL_SIZE: int = 100
     ALLOWED_ORIGINS: Union[List[str], str] = ["http://localhost:8000"]
+    # Emails con acceso a /api/admin (profiling)
+    ADMIN_EMAILS: Union[List[str], str] = []
+    # Bearer token para leer /metrics sin usuario (scrapers); vacío = sólo admins
+    METRICS_TOKEN: str = ""
     RATE_LIMIT_PER_MINUTE: int = 100
     
+    # Cantidad máxima de usuarios con índice de config_sites en memoria
+    SITE_MATCHER_CACHE_SIZE: int = 10000
+    
+    # Retención: resolución completa N días, luego diaria y luego mensual
+    RETENTION_ENABLED: bool = False
+    RETENTION_FULL_DAYS: int = 30
+    RETENTION_DAILY_DAYS: int = 365
+    RETENTION_INTERVAL_HOURS: int = 24
+    RETENTION_BATCH_SIZE: int = 500
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.05
+    
+    # Auditoría de sincronización (sync_logs)
+    SYNC_LOG_TTL_DAYS: int = 30
+    SYNC_LOG_BUFFER_SIZE: int = 10000
+    SYNC_LOG_BATCH_SIZE: int = 500
+    SYNC_LOG_FLUSH_INTERVAL_SECONDS: float = 5.0
+    
+    # Escritura diferida de actividad de usuarios (last_login)
+    USER_ACTIVITY_FLUSH_INTERVAL_SECONDS: float = 10.0
+    
+    # Group commit de POST /api/investments (0 = escribir cada request por separado)
+    WRITE_BATCH_WINDOW_MS: float = 5.0
+    WRITE_BATCH_MAX_RECORDS: int = 500
+    
+    # Recarga de la tabla fx_rates en cada worker (0 = sólo al iniciar)
+    FX_RATES_REFRESH_MINUTES: int = 60
+    
+    # Usuarios con métricas de performance en memoria
+    PERFORMANCE_CACHE_SIZE: int = 1000
+    
+    # Cache de config_sites y preferencias por usuario
+    CONFIG_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # Backend compartido entre workers (requiere el paquete redis)
+    CONFIG_CACHE_REDIS_URL: str = ""
+    # Vencimiento de las entradas (Redis y cache local)
+    CONFIG_CACHE_TTL_SECONDS: int = 300
+    
+    # Filas por record batch / row group en export Parquet/Arrow
+    COLUMNAR_BATCH_SIZE: int = 10000
+    
+    # Sesiones de carga por chunks (/api/sync/uploads)
+    UPLOAD_MAX_CHUNK_RECORDS: int = 1000
+    UPLOAD_MAX_CHUNK_BYTES: int = 1048576  # se rechaza antes de leer el cuerpo
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    
+    # Captura de tráfico (forma de los requests, sin datos) para replay
+    CAPTURE_ENABLED: bool = False
+    CAPTURE_PATH: str = "traffic.capture"
+    CAPTURE_SAMPLE_RATE: float = 1.0
+    
+    # Profiling: /api/admin/profile y perfiles de requests lentos
+    PROFILE_MAX_SECONDS: int = 60
+    SLOW_REQUEST_MS: int = 0  # 0 = desactivado
+    SLOW_REQUEST_SAMPLE_INTERVAL_MS: float = 10.0
+    SLOW_REQUEST_WINDOW_SECONDS: int = 120
+    SLOW_REQUEST_PROFILE_DIR: str = "slow_requests"
+    SLOW_REQUEST_MAX_PROFILES: int = 100
+    
+    # Respuestas guardadas por Idempotency-Key (push y bulk)
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    # Si el worker que procesa una key muere, otro la retoma pasado este tiempo
+    IDEMPOTENCY_LOCK_SECONDS: int = 300
+    
     model_config = SettingsConfigDict(env_file=".env")
     
-    @field_validator("ALLOWED_ORIGINS", mode="before")
+    @field_validator("ALLOWED_ORIGINS", "ADMIN_EMAILS", mode="before")
     @classmethod
     def parse_origins(cls, v):
         if isinstance(v, str):
-            return [origin.strip() for origin in v.split(",")]
+            return [origin.strip() for origin in v.split(",") if origin.strip()]
         return v
 
 
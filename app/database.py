@@ -1,15 +1,68 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
+from app.utils.command_trace import CommandTracer
 
 client: AsyncIOMotorClient = None
 db = None
 
 
+def worker_pool_size() -> int:
+    """Pool de conexiones de este worker: el total configurado dividido entre los workers"""
+    workers = max(settings.WEB_CONCURRENCY, 1)
+    return max(settings.MONGODB_MAX_POOL_SIZE // workers, 1)
+
+
+async def ensure_ttl_index(database, collection: str, field: str, seconds: int):
+    """
+    Índice TTL sobre `field`. Si ya existe con otro expireAfterSeconds (por
+    ejemplo, cambió SYNC_LOG_TTL_DAYS) create_index falla con
+    IndexOptionsConflict: en ese caso se actualiza con collMod.
+    """
+    for spec in (await database[collection].index_information()).values():
+        if list(spec["key"]) == [(field, 1)]:
+            if spec.get("expireAfterSeconds") != seconds:
+                await database.command({
+                    "collMod": collection,
+                    "index": {"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+                })
+                print(f"✅ Updated {collection}.{field} TTL to {seconds}s")
+            return
+    await database[collection].create_index([(field, 1)], expireAfterSeconds=seconds)
+
+
+async def create_indexes(database):
+    """Índices de la aplicación (también los usa tests/test_query_plans.py)"""
+    await database.users.create_index("email", unique=True)
+    await database.investments.create_index(
+        [("user_id", 1), ("timestamp", 1), ("entidad", 1)],
+        unique=True
+    )
+    await database.investments.create_index([("user_id", 1), ("timestamp", -1)])
+    await database.investments.create_index([("user_id", 1), ("entidad", 1)])
+    # Último snapshot por entidad a una fecha (GET /api/investments/as-of)
+    await database.investments.create_index([("user_id", 1), ("entidad", 1), ("timestamp", -1)])
+    # Orden por updated_at en get_sync_status y pull_sync
+    await database.investments.create_index([("user_id", 1), ("updated_at", -1)])
+    await database.config_sites.create_index([("user_id", 1)])
+    await database.config_sites.create_index([("user_id", 1), ("updated_at", -1)])
+    await ensure_ttl_index(database, "sync_logs", "timestamp", settings.SYNC_LOG_TTL_DAYS * 86400)
+    await database.sync_logs.create_index([("user_id", 1), ("timestamp", -1)])
+    await ensure_ttl_index(database, "upload_sessions", "expires_at", 0)
+    await ensure_ttl_index(database, "idempotency_keys", "expires_at", 0)
+    await database.fx_rates.create_index([("timestamp", 1)], unique=True)
+
+
 async def connect_to_mongo():
     global client, db
     try:
         print(f"🔌 Connecting to MongoDB...")
-        client = AsyncIOMotorClient(settings.MONGODB_URI, serverSelectionTimeoutMS=5000)
+        client = AsyncIOMotorClient(
+            settings.MONGODB_URI,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=worker_pool_size(),
+            # Traza de comandos para los perfiles de requests lentos
+            event_listeners=[CommandTracer()] if settings.SLOW_REQUEST_MS > 0 else []
+        )
         db = client["investment-tracker"]  # Especificar nombre de base de datos explícitamente
         
         # Test connection
@@ -17,14 +70,7 @@ async def connect_to_mongo():
         print(f"✅ MongoDB connected successfully to database: investment-tracker")
         
         # Crear índices
-        await db.users.create_index("email", unique=True)
-        await db.investments.create_index(
-            [("user_id", 1), ("timestamp", 1), ("entidad", 1)],
-            unique=True
-        )
-        await db.investments.create_index([("user_id", 1), ("timestamp", -1)])
-        await db.investments.create_index([("user_id", 1), ("entidad", 1)])
-        await db.config_sites.create_index([("user_id", 1)])
+        await create_indexes(db)
         print("✅ Database indexes created")
         
     except Exception as e:
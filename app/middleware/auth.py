@@ -1,7 +1,9 @@
+import secrets
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.utils.security import decode_access_token
 from app.database import get_database
+from app.config import settings
 from bson import ObjectId
 
 security = HTTPBearer()
@@ -27,6 +29,7 @@ async def get_current_user(
         )
     
     db = get_database()
+    # Trae también preferences y config_generation (ver app.utils.config_cache)
     user = await db.users.find_one({"_id": ObjectId(user_id)})
     
     if not user:
@@ -36,3 +39,25 @@ async def get_current_user(
         )
     
     return user
+
+
+async def get_admin_user(
+    current_user: dict = Depends(get_current_user)
+):
+    if current_user.get("email") not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Requiere permisos de administrador"
+        )
+    
+    return current_user
+
+
+async def get_metrics_reader(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """/metrics: el METRICS_TOKEN configurado o un usuario administrador"""
+    if settings.METRICS_TOKEN and secrets.compare_digest(credentials.credentials, settings.METRICS_TOKEN):
+        return None
+    
+    return await get_admin_user(await get_current_user(credentials))
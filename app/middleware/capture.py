@@ -0,0 +1,110 @@
+import time
+from typing import Dict, List, Optional
+from starlette.datastructures import Headers, QueryParams
+from app.utils.traffic_capture import (
+    CREATE_ROUTES,
+    client_slot,
+    created_token,
+    list_lengths,
+    path_shape,
+    payload_counts,
+    query_shape,
+    record_request,
+    sampled
+)
+
+# Los cuerpos que valida negotiated_body se cuentan sobre el payload ya
+# validado; el resto se decodifica de nuevo en el event loop sólo si es chico
+_MAX_INSPECTED_BYTES = 64 * 1024
+
+
+class TrafficCaptureMiddleware:
+    """
+    Registra la forma de cada request (ruta, tamaños, cantidad de registros,
+    tiempos) para reproducir el tráfico con scripts/replay_traffic.py.
+    No guarda montos, tokens ni credenciales; los ids del path y los de los
+    registros creados se guardan hasheados, para relacionar los requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[object, List]] = None
+
+    def _route_path(self, scope) -> Optional[str]:
+        """Template de la ruta (`/api/investments/{investment_id}`), no el path real"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return None
+        if self._routes is None:
+            self._routes = {}
+            for route in scope["app"].routes:
+                self._routes.setdefault(getattr(route, "endpoint", None), []).append(route)
+        for route in self._routes.get(endpoint, ()):
+            if route.path_regex.match(scope["path"]):
+                return route.path
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not sampled():
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        start = time.perf_counter()
+        body: List[bytes] = []
+        response_body: List[bytes] = []
+        sizes = {"in": 0, "out": 0, "status": 500}
+        created = {}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                sizes["in"] += len(chunk)
+                if sizes["in"] <= _MAX_INSPECTED_BYTES:
+                    body.append(chunk)
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                sizes["status"] = message["status"]
+                created_id = CREATE_ROUTES.get((scope["method"], self._route_path(scope)))
+                if created_id is not None:
+                    created["field"] = created_id[1]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                sizes["out"] += len(chunk)
+                if created and sizes["out"] <= _MAX_INSPECTED_BYTES:
+                    response_body.append(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            headers = Headers(scope=scope)
+            content_type = headers.get("content-type")
+            state = scope.get("state") or {}
+            if "payload" in state:
+                counts = list_lengths(state["payload"])
+            elif sizes["in"] <= _MAX_INSPECTED_BYTES:
+                counts = payload_counts(b"".join(body), content_type)
+            else:
+                counts = {}
+            entry = {
+                "t": round(started_at * 1000, 1),
+                "u": client_slot(headers.get("authorization")),
+                "m": scope["method"],
+                "r": self._route_path(scope),
+                "p": path_shape(scope.get("path_params") or {}),
+                "q": query_shape(QueryParams(scope.get("query_string", b""))),
+                "ct": content_type,
+                "ac": headers.get("accept"),
+                "in": sizes["in"],
+                "n": counts,
+                "out": sizes["out"],
+                "s": sizes["status"],
+                "ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+            if created and sizes["out"] <= _MAX_INSPECTED_BYTES:
+                entry["c"] = created_token(b"".join(response_body), created["field"])
+            record_request(entry)
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from app.config import settings
+from app.utils.command_trace import begin_trace, end_trace
+from app.utils.profiler import collapsed, samples_between, save_slow_request
+
+
+class SlowRequestMiddleware:
+    """
+    Guarda un perfil (stacks sampleados del event loop) y la traza de
+    comandos Mongo de cada request que tarda más de SLOW_REQUEST_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # /api/admin/profile siempre es "lento": no perfilar los endpoints de admin
+        if scope["type"] != "http" or scope["path"].startswith("/api/admin"):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        start = time.monotonic()
+        status = {"code": 500}
+        token = begin_trace()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            commands = end_trace(token)
+            end = time.monotonic()
+            elapsed_ms = (end - start) * 1000
+            if elapsed_ms >= settings.SLOW_REQUEST_MS:
+                for command in commands:
+                    command["at"] = round((command["at"] - start) * 1000, 2)
+                    command.pop("requestId", None)
+                entry = {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status["code"],
+                    "ms": round(elapsed_ms, 2),
+                    "startedAt": started_at,
+                    "profile": collapsed(samples_between(start, end)),
+                    "mongo": commands
+                }
+                # Escribir a disco fuera del event loop
+                loop = asyncio.get_running_loop()
+                loop.run_in_executor(None, save_slow_request, entry)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import Optional, List
+from typing_extensions import TypedDict, NotRequired
 
 
 class InvestmentCreate(BaseModel):
@@ -26,3 +27,27 @@ class InvestmentUpdate(BaseModel):
 
 class BulkInvestmentRequest(BaseModel):
     records: List[InvestmentCreate]
+
+
+# Fast path para payloads grandes: valida directo a dicts listos para insertar,
+# sin construir un InvestmentCreate por fila. Mismas reglas y mensajes de error.
+class InvestmentRecord(TypedDict):
+    timestamp: int
+    entidad: str
+    monto_ars: NotRequired[Optional[float]]
+    monto_usd: NotRequired[Optional[float]]
+
+
+class BulkInvestmentPayload(TypedDict):
+    records: List[InvestmentRecord]
+
+
+bulk_investment_adapter = TypeAdapter(BulkInvestmentPayload)
+
+
+def with_defaults(records: List[InvestmentRecord]) -> List[InvestmentRecord]:
+    """Completa los montos omitidos con None, como hace InvestmentCreate"""
+    for record in records:
+        record.setdefault("monto_ars", None)
+        record.setdefault("monto_usd", None)
+    return records
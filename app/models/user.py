@@ -24,3 +24,9 @@ class PreferencesUpdate(BaseModel):
     theme: Optional[str] = None
     autoReplication: Optional[Dict[str, Any]] = None
     manualRecordReferences: Optional[Dict[str, Any]] = None
+
+
+class RetentionUpdate(BaseModel):
+    enabled: Optional[bool] = None
+    fullDays: Optional[int] = Field(None, ge=1)
+    dailyDays: Optional[int] = Field(None, ge=1)
@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.middleware.auth import get_admin_user
+from app.utils.profiler import (
+    collapsed,
+    profile_running,
+    sample_profile,
+    list_slow_requests,
+    read_slow_request
+)
+
+router = APIRouter()
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_worker(
+    seconds: float = Query(10, gt=0),
+    intervalMs: float = Query(5, ge=1),
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Samplea el event loop del worker que atiende el request durante `seconds`
+    y devuelve los stacks en formato "collapsed" (flamegraph.pl, speedscope).
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds debe ser menor o igual a {settings.PROFILE_MAX_SECONDS}"
+        )
+    if profile_running():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya hay un perfil en curso en este worker"
+        )
+    
+    samples = await sample_profile(seconds, intervalMs)
+    return PlainTextResponse(collapsed(samples))
+
+
+@router.get("/slow-requests")
+async def get_slow_requests(
+    admin: dict = Depends(get_admin_user)
+):
+    return {
+        "success": True,
+        "data": list_slow_requests(),
+        "thresholdMs": settings.SLOW_REQUEST_MS
+    }
+
+
+@router.get("/slow-requests/{name}")
+async def get_slow_request(
+    name: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    admin: dict = Depends(get_admin_user)
+):
+    entry = read_slow_request(name)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado"
+        )
+    
+    if format == "collapsed":
+        return PlainTextResponse(entry["profile"])
+    
+    return {
+        "success": True,
+        "data": entry
+    }
@@ -7,6 +7,7 @@ from app.utils.security import (
     create_access_token
 )
 from app.middleware.auth import get_current_user
+from app.utils.user_activity import record_user_activity
 from datetime import datetime
 
 router = APIRouter()
@@ -65,7 +66,10 @@ async def login(credentials: UserLogin):
         )
     
     # Buscar usuario
-    user = await db.users.find_one({"email": credentials.email})
+    user = await db.users.find_one(
+        {"email": credentials.email},
+        projection={"email": 1, "name": 1, "password_hash": 1}
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -79,11 +83,8 @@ async def login(credentials: UserLogin):
             detail="Credenciales inválidas"
         )
     
-    # Actualizar último login
-    await db.users.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
-    )
+    # Actualizar último login (se escribe en segundo plano)
+    record_user_activity(user["_id"], last_login=datetime.utcnow())
     
     # Generar token
     user_id = str(user["_id"])
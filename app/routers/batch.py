@@ -0,0 +1,99 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Request
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+from app.middleware.auth import get_current_user
+from app.routers.auth import validate_token
+from app.routers.config import get_config_sites, get_preferences
+from app.routers.sync import get_sync_status, pull_payload
+from app.utils.serialization import negotiated_response
+
+router = APIRouter()
+
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    query: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., max_length=20)
+
+
+def _since(query: dict) -> Optional[int]:
+    since = query.get("since")
+    if since in (None, ""):
+        return None
+    try:
+        return int(since)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="since debe ser un entero"
+        )
+
+
+# Endpoints de lectura que la extensión pide al iniciar
+_HANDLERS = {
+    "/api/auth/validate": lambda user, query: validate_token(current_user=user),
+    "/api/sync/status": lambda user, query: get_sync_status(current_user=user),
+    "/api/user/preferences": lambda user, query: get_preferences(current_user=user),
+    "/api/config/preferences": lambda user, query: get_preferences(current_user=user),
+    "/api/config/sites": lambda user, query: get_config_sites(current_user=user),
+    "/api/user/sites": lambda user, query: get_config_sites(current_user=user),
+    "/api/sync/pull": lambda user, query: pull_payload(user, _since(query)),
+}
+
+
+async def _run(sub_request: BatchSubRequest, current_user: dict) -> dict:
+    response = {"id": sub_request.id, "path": sub_request.path}
+    handler = _HANDLERS.get(sub_request.path.rstrip("/"))
+
+    try:
+        if handler is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ruta no soportada en batch"
+            )
+        if sub_request.method.upper() != "GET":
+            raise HTTPException(
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+                detail="Sólo se admiten requests GET en batch"
+            )
+        response["status"] = status.HTTP_200_OK
+        response["body"] = await handler(current_user, sub_request.query)
+    except HTTPException as e:
+        response["status"] = e.status_code
+        response["body"] = {"detail": e.detail}
+    except Exception as e:
+        print(f"❌ Batch sub-request {sub_request.path} failed: {e}")
+        response["status"] = status.HTTP_500_INTERNAL_SERVER_ERROR
+        response["body"] = {"detail": "Error interno"}
+
+    return response
+
+
+# Sin barra final: POST /api/batch no pasa por un redirect 307 (un round
+# trip más, y algunos clientes pierden el cuerpo al seguirlo)
+@router.post("")
+@router.post("/", include_in_schema=False)
+async def batch(
+    request: Request,
+    batch_request: BatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Ejecuta varios GET en un solo request. La autenticación se resuelve una
+    vez y los sub-requests corren concurrentemente contra la base.
+    """
+    responses = await asyncio.gather(*[
+        _run(sub_request, current_user)
+        for sub_request in batch_request.requests
+    ])
+    
+    return negotiated_response(request, {
+        "success": True,
+        "responses": responses
+    })
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from app.models.config_site import ConfigSiteCreate, ConfigSiteUpdate
-from app.models.user import PreferencesUpdate
+from app.models.user import PreferencesUpdate, RetentionUpdate
 from app.middleware.auth import get_current_user
 from app.database import get_database
+from app.utils.serialization import serialize_document
+from app.utils.retention import retention_policy, compact_user
+from app.utils.site_matcher import get_cached_matcher, cache_matcher
+from app.utils import config_cache
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
 router = APIRouter()
 
@@ -15,19 +20,32 @@ async def get_config_sites(
     current_user: dict = Depends(get_current_user)
 ):
     db = get_database()
-    user_id = current_user["_id"]
+    config_sites = await config_cache.get_config_sites(db, current_user)
     
-    cursor = db.config_sites.find({"user_id": user_id})
-    config_sites = await cursor.to_list(length=None)
+    return {
+        "success": True,
+        "data": config_sites
+    }
+
+
+@router.get("/sites/match")
+async def match_config_sites(
+    url: str,
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user["_id"]
+    generation = config_cache.config_generation(current_user)
     
-    # Convertir ObjectId a string
-    for site in config_sites:
-        site["id"] = str(site.pop("_id"))
-        site["user_id"] = str(site["user_id"])
+    # Índice compilado por worker; la generación lo invalida en todos
+    matcher = get_cached_matcher(user_id, generation)
+    if matcher is None:
+        db = get_database()
+        config_sites = await config_cache.get_config_sites(db, current_user)
+        matcher = cache_matcher(user_id, config_sites, generation)
     
     return {
         "success": True,
-        "data": config_sites
+        "data": matcher.match(url)
     }
 
 
@@ -45,14 +63,12 @@ async def create_config_site(
     config_dict["created_at"] = datetime.utcnow()
     config_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.config_sites.insert_one(config_dict)
-    
-    config_dict["id"] = str(result.inserted_id)
-    config_dict["user_id"] = str(config_dict["user_id"])
+    await db.config_sites.insert_one(config_dict)
+    await config_cache.invalidate_config_cache(db, user_id)
     
     return {
         "success": True,
-        "data": config_dict
+        "data": serialize_document(config_dict)
     }
 
 
@@ -84,25 +100,24 @@ async def update_config_site(
     
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.config_sites.update_one(
+    # Actualizar y obtener la configuración resultante en un solo round trip
+    config_site = await db.config_sites.find_one_and_update(
         {"_id": ObjectId(site_id), "user_id": user_id},
-        {"$set": update_dict}
+        {"$set": update_dict},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if config_site is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Configuración no encontrada"
         )
     
-    # Obtener configuración actualizada
-    config_site = await db.config_sites.find_one({"_id": ObjectId(site_id)})
-    config_site["id"] = str(config_site.pop("_id"))
-    config_site["user_id"] = str(config_site["user_id"])
+    await config_cache.invalidate_config_cache(db, user_id)
     
     return {
         "success": True,
-        "data": config_site
+        "data": serialize_document(config_site)
     }
 
 
@@ -125,6 +140,8 @@ async def delete_config_site(
             detail="Configuración no encontrada"
         )
     
+    await config_cache.invalidate_config_cache(db, user_id)
+    
     return {"success": True, "message": "Configuración eliminada"}
 
 
@@ -133,11 +150,9 @@ async def delete_config_site(
 async def get_preferences(
     current_user: dict = Depends(get_current_user)
 ):
-    preferences = current_user.get("preferences", {})
-    
     return {
         "success": True,
-        "data": preferences
+        "data": current_user.get("preferences", {})
     }
 
 
@@ -149,9 +164,6 @@ async def update_preferences(
     db = get_database()
     user_id = current_user["_id"]
     
-    # Obtener preferencias actuales
-    current_prefs = current_user.get("preferences", {})
-    
     # Actualizar solo los campos proporcionados
     update_dict = {}
     if preferences.theme is not None:
@@ -161,16 +173,84 @@ async def update_preferences(
     if preferences.manualRecordReferences is not None:
         update_dict["preferences.manualRecordReferences"] = preferences.manualRecordReferences
     
-    if update_dict:
-        await db.users.update_one(
-            {"_id": user_id},
-            {"$set": update_dict}
-        )
+    if not update_dict:
+        return {
+            "success": True,
+            "data": current_user.get("preferences", {})
+        }
+    
+    # Actualizar y leer sólo las preferencias resultantes
+    updated_user = await db.users.find_one_and_update(
+        {"_id": user_id},
+        {"$set": update_dict},
+        projection={"preferences": 1},
+        return_document=ReturnDocument.AFTER
+    )
     
-    # Obtener usuario actualizado
-    updated_user = await db.users.find_one({"_id": user_id})
+    if updated_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuario no encontrado"
+        )
     
     return {
         "success": True,
         "data": updated_user.get("preferences", {})
     }
+
+
+# Retention Endpoints
+@router.get("/retention")
+async def get_retention(
+    current_user: dict = Depends(get_current_user)
+):
+    return {
+        "success": True,
+        "data": retention_policy(current_user)
+    }
+
+
+@router.put("/retention")
+async def update_retention(
+    retention: RetentionUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    db = get_database()
+    user_id = current_user["_id"]
+    
+    update_dict = {
+        f"retention.{field}": value
+        for field, value in retention.model_dump(exclude_none=True).items()
+    }
+    
+    if not update_dict:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No hay campos para actualizar"
+        )
+    
+    updated_user = await db.users.find_one_and_update(
+        {"_id": user_id},
+        {"$set": update_dict},
+        projection={"retention": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    return {
+        "success": True,
+        "data": retention_policy(updated_user)
+    }
+
+
+@router.get("/retention/report")
+async def get_retention_report(
+    current_user: dict = Depends(get_current_user)
+):
+    """Dry run: filas y bytes que recuperaría la compactación"""
+    db = get_database()
+    report = await compact_user(db, current_user, dry_run=True)
+    
+    return {
+        "success": True,
+        "data": report
+    }
@@ -1,14 +1,65 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from typing import Optional
-from app.models.investment import InvestmentCreate, InvestmentUpdate, BulkInvestmentRequest
+from app.models.investment import (
+    InvestmentCreate,
+    InvestmentUpdate,
+    BulkInvestmentPayload,
+    bulk_investment_adapter,
+    with_defaults
+)
 from app.middleware.auth import get_current_user
 from app.database import get_database
+from app.utils.serialization import body_openapi, negotiated_body, serialize_document
+from app.utils.idempotency import idempotent_response
+from app.utils.sync_log import log_sync_event
+from app.utils.investment_writes import upsert_investment, CREATED, UPDATED, UNCHANGED
+from app.utils.write_batcher import submit_investment
+from app.utils.fx_rates import VALUATION_STAGE
+from app.utils.performance import (
+    load_columns,
+    compute_performance,
+    data_version,
+    get_cached_performance,
+    cache_performance,
+    invalidate_performance
+)
+from pymongo import ReturnDocument
 from bson import ObjectId
 from datetime import datetime
+import asyncio
 
 router = APIRouter()
 
 
+def investment_filter(
+    user_id,
+    entity: Optional[str] = None,
+    date_from: Optional[int] = None,
+    date_to: Optional[int] = None
+) -> dict:
+    """Filtro de get_investments (también lo usa tests/test_query_plans.py)"""
+    filter_query = {"user_id": user_id}
+    
+    if entity:
+        filter_query["entidad"] = entity
+    
+    if date_from or date_to:
+        filter_query["timestamp"] = {}
+        if date_from:
+            filter_query["timestamp"]["$gte"] = date_from
+        if date_to:
+            filter_query["timestamp"]["$lte"] = date_to
+    return filter_query
+
+
+def as_of_filter(user_id, entidad: str, ts: int) -> dict:
+    """Snapshots de una entidad hasta `ts`; se leen ordenados por AS_OF_SORT"""
+    return {"user_id": user_id, "entidad": entidad, "timestamp": {"$lte": ts}}
+
+
+AS_OF_SORT = [("timestamp", -1)]
+
+
 @router.get("/")
 async def get_investments(
     entity: Optional[str] = None,
@@ -21,18 +72,7 @@ async def get_investments(
     db = get_database()
     user_id = current_user["_id"]
     
-    # Construir filtro
-    filter_query = {"user_id": user_id}
-    
-    if entity:
-        filter_query["entidad"] = entity
-    
-    if dateFrom or dateTo:
-        filter_query["timestamp"] = {}
-        if dateFrom:
-            filter_query["timestamp"]["$gte"] = dateFrom
-        if dateTo:
-            filter_query["timestamp"]["$lte"] = dateTo
+    filter_query = investment_filter(user_id, entity, dateFrom, dateTo)
     
     # Consultar
     cursor = db.investments.find(filter_query).sort("timestamp", -1).skip(offset).limit(limit)
@@ -42,8 +82,7 @@ async def get_investments(
     
     # Convertir ObjectId a string
     for inv in investments:
-        inv["id"] = str(inv.pop("_id"))
-        inv["user_id"] = str(inv["user_id"])
+        serialize_document(inv)
     
     return {
         "success": True,
@@ -57,107 +96,138 @@ async def get_investments(
     }
 
 
-@router.post("/")
-async def create_investment(
-    investment: InvestmentCreate,
+@router.get("/performance")
+async def get_performance(
+    series: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
+    """
+    Métricas por entidad calculadas en el servidor: retorno del período, CAGR,
+    máximo drawdown, volatilidad y tipo de cambio implícito ARS/USD.
+    """
     db = get_database()
     user_id = current_user["_id"]
     
-    # Verificar si existe
-    existing = await db.investments.find_one({
-        "user_id": user_id,
-        "timestamp": investment.timestamp,
-        "entidad": investment.entidad
-    })
+    # La versión se lee antes que los datos: si entra una escritura en el
+    # medio, la próxima consulta ve otra versión y recalcula
+    version = await data_version(db, user_id)
+    result = get_cached_performance(user_id, series, version)
+    if result is None:
+        columns = await load_columns(db, user_id)
+        result = compute_performance(columns, include_series=series)
+        cache_performance(user_id, series, result, version)
     
-    if existing:
-        # Actualizar
-        await db.investments.update_one(
-            {"_id": existing["_id"]},
-            {
-                "$set": {
-                    "monto_ars": investment.monto_ars,
-                    "monto_usd": investment.monto_usd,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-        return {
-            "success": True,
-            "data": {"id": str(existing["_id"])},
-            "isUpdate": True
-        }
+    return {
+        "success": True,
+        "data": result
+    }
+
+
+@router.get("/as-of")
+async def get_investments_as_of(
+    ts: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cartera a la fecha `ts`: el último snapshot de cada entidad con
+    timestamp <= ts. Una búsqueda acotada por entidad sobre el índice
+    (user_id, entidad, timestamp -1), sin recorrer el historial.
+    """
+    db = get_database()
+    user_id = current_user["_id"]
+    
+    entidades = await db.investments.distinct("entidad", {"user_id": user_id})
     
-    # Crear nuevo
-    investment_dict = investment.model_dump()
-    investment_dict["user_id"] = user_id
-    investment_dict["created_at"] = datetime.utcnow()
-    investment_dict["updated_at"] = datetime.utcnow()
+    snapshots = await asyncio.gather(*(
+        db.investments.find_one(as_of_filter(user_id, entidad, ts), sort=AS_OF_SORT)
+        for entidad in entidades
+    ))
+    
+    investments = [serialize_document(inv) for inv in snapshots if inv is not None]
+    investments.sort(key=lambda inv: inv["entidad"])
+    
+    return {
+        "success": True,
+        "data": investments,
+        "totals": {
+            "ars": sum(inv["monto_ars"] for inv in investments if inv.get("monto_ars") is not None),
+            "usd": sum(inv["monto_usd"] for inv in investments if inv.get("monto_usd") is not None),
+            # Toda la cartera en una sola moneda (montos convertidos al escribir)
+            "valorArs": sum(inv["valor_ars"] for inv in investments if inv.get("valor_ars") is not None),
+            "valorUsd": sum(inv["valor_usd"] for inv in investments if inv.get("valor_usd") is not None)
+        },
+        "asOf": ts
+    }
+
+
+@router.post("/")
+async def create_investment(
+    investment: InvestmentCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    user_id = current_user["_id"]
     
-    result = await db.investments.insert_one(investment_dict)
+    # Se agrupa con las escrituras concurrentes de otros requests (group commit)
+    outcome, investment_id = await submit_investment(user_id, investment.model_dump())
+    if outcome != UNCHANGED:
+        invalidate_performance(user_id)
     
     return {
         "success": True,
-        "data": {"id": str(result.inserted_id)},
-        "isUpdate": False
+        "data": {"id": str(investment_id)},
+        "isUpdate": outcome != CREATED,
+        "changed": outcome != UNCHANGED
     }
 
 
-@router.post("/bulk")
+@router.post("/bulk", openapi_extra=body_openapi(bulk_investment_adapter))
 async def bulk_create_investments(
-    bulk_request: BulkInvestmentRequest,
+    request: Request,
+    bulk_request: BulkInvestmentPayload = Depends(negotiated_body(bulk_investment_adapter)),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_database()
     user_id = current_user["_id"]
     
-    created = 0
-    updated = 0
+    return await idempotent_response(
+        request,
+        user_id,
+        lambda: _apply_bulk(db, user_id, bulk_request)
+    )
+
+
+async def _apply_bulk(db, user_id, bulk_request: BulkInvestmentPayload) -> dict:
+    records = with_defaults(bulk_request["records"])
+    counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0}
     failed = 0
     
-    for investment in bulk_request.records:
+    for record in records:
         try:
-            # Verificar si existe
-            existing = await db.investments.find_one({
-                "user_id": user_id,
-                "timestamp": investment.timestamp,
-                "entidad": investment.entidad
-            })
-            
-            if existing:
-                # Actualizar
-                await db.investments.update_one(
-                    {"_id": existing["_id"]},
-                    {
-                        "$set": {
-                            "monto_ars": investment.monto_ars,
-                            "monto_usd": investment.monto_usd,
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
-                updated += 1
-            else:
-                # Crear nuevo
-                investment_dict = investment.model_dump()
-                investment_dict["user_id"] = user_id
-                investment_dict["created_at"] = datetime.utcnow()
-                investment_dict["updated_at"] = datetime.utcnow()
-                
-                await db.investments.insert_one(investment_dict)
-                created += 1
+            outcome, _ = await upsert_investment(db, user_id, record)
+            counts[outcome] += 1
         except Exception as e:
             print(f"Error processing investment: {e}")
             failed += 1
     
+    if counts[CREATED] or counts[UPDATED]:
+        invalidate_performance(user_id)
+    
+    log_sync_event(
+        user_id,
+        "bulk",
+        counts[CREATED] + counts[UPDATED],
+        success=failed == 0,
+        failed=failed,
+        unchanged=counts[UNCHANGED]
+    )
+    
     return {
         "success": True,
         "summary": {
-            "total": len(bulk_request.records),
-            "created": created,
-            "updated": updated,
+            "total": len(records),
+            "created": counts[CREATED],
+            "updated": counts[UPDATED],
+            "unchanged": counts[UNCHANGED],
             "failed": failed
         }
     }
@@ -187,25 +257,25 @@ async def update_investment(
     
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.investments.update_one(
+    # Actualizar, recalcular valor_ars/valor_usd con el fx_rate del registro
+    # y obtener el resultado en un solo round trip
+    investment = await db.investments.find_one_and_update(
         {"_id": ObjectId(investment_id), "user_id": user_id},
-        {"$set": update_dict}
+        [{"$set": update_dict}, VALUATION_STAGE],
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if investment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registro no encontrado"
         )
     
-    # Obtener registro actualizado
-    investment = await db.investments.find_one({"_id": ObjectId(investment_id)})
-    investment["id"] = str(investment.pop("_id"))
-    investment["user_id"] = str(investment["user_id"])
+    invalidate_performance(user_id)
     
     return {
         "success": True,
-        "data": investment
+        "data": serialize_document(investment)
     }
 
 
@@ -228,6 +298,8 @@ async def delete_investment(
             detail="Registro no encontrado"
         )
     
+    invalidate_performance(user_id)
+    
     return {"success": True, "message": "Registro eliminado"}
 
 
@@ -239,6 +311,7 @@ async def delete_all_investments(
     user_id = current_user["_id"]
     
     result = await db.investments.delete_many({"user_id": user_id})
+    invalidate_performance(user_id)
     
     return {
         "success": True,
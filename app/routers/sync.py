@@ -1,22 +1,55 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
-from app.models.investment import InvestmentCreate
+from pydantic import BaseModel, Field, TypeAdapter
+from typing_extensions import Annotated
+from typing_extensions import TypedDict, NotRequired
+from app.models.investment import InvestmentRecord, with_defaults
 from app.models.config_site import ConfigSiteCreate
 from app.middleware.auth import get_current_user
 from app.database import get_database
-from datetime import datetime
+from app.utils.serialization import body_openapi, negotiated_body, negotiated_response, serialize_document
+from app.utils.config_cache import invalidate_config_cache
+from app.utils.idempotency import idempotent_response
+from app.utils.sync_log import log_sync_event
+from app.utils.investment_writes import key_filter, upsert_investment, CREATED, UPDATED, UNCHANGED
+from app.utils.performance import invalidate_performance
+from app.utils import columnar
+from app.utils.fx_rates import valuations
+from app.config import settings
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
 
 router = APIRouter()
 
 
-class SyncPushRequest(BaseModel):
-    investments: Optional[List[InvestmentCreate]] = []
-    configSites: Optional[List[ConfigSiteCreate]] = []
-    preferences: Optional[Dict[str, Any]] = None
+class SyncPushPayload(TypedDict):
+    """Cuerpo de /sync/push, validado directo a dicts"""
+    investments: NotRequired[Optional[List[InvestmentRecord]]]
+    configSites: NotRequired[Optional[List[ConfigSiteCreate]]]
+    preferences: NotRequired[Optional[Dict[str, Any]]]
     clientTimestamp: str
 
 
+sync_push_adapter = TypeAdapter(SyncPushPayload)
+
+
+class UploadOpenRequest(BaseModel):
+    totalChunks: Optional[int] = Field(None, ge=1)
+    clientTimestamp: Optional[str] = None
+
+
+class UploadChunkPayload(TypedDict):
+    investments: Annotated[
+        List[InvestmentRecord],
+        Field(max_length=settings.UPLOAD_MAX_CHUNK_RECORDS)
+    ]
+
+
+upload_chunk_adapter = TypeAdapter(UploadChunkPayload)
+
+
 class ExportData(BaseModel):
     investments: Optional[List[Dict[str, Any]]] = []
     configSites: Optional[List[Dict[str, Any]]] = []
@@ -28,6 +61,41 @@ class ImportRequest(BaseModel):
     mode: str = "merge"  # "merge" or "replace"
 
 
+_import_json_body = negotiated_body(ImportRequest)
+
+
+def site_key_filter(user_id, name: Optional[str], url_pattern: Optional[str]) -> dict:
+    """Un sitio se identifica por nombre y urlPattern (push y import merge)"""
+    return {"user_id": user_id, "name": name, "urlPattern": url_pattern}
+
+
+def changed_since_filter(user_id, since: Optional[int] = None) -> dict:
+    """Registros del usuario modificados desde `since` (ms), para investments y config_sites"""
+    filter_query = {"user_id": user_id}
+    if since:
+        filter_query["updated_at"] = {"$gte": datetime.fromtimestamp(since / 1000)}
+    return filter_query
+
+
+
+async def import_body(
+    request: Request,
+    mode: Optional[str] = Query(None, pattern="^(merge|replace)$")
+) -> ImportRequest:
+    """
+    Cuerpo de /import: el JSON de siempre o un export Parquet/Arrow
+    (en ese caso el modo va por query string).
+    """
+    media_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if media_type in columnar.MEDIA_TYPES:
+        table = columnar.read_table(await request.body(), media_type)
+        return ImportRequest(
+            data=ExportData(**columnar.table_to_export_data(table)),
+            mode=mode or "merge"
+        )
+    return await _import_json_body(request)
+
+
 @router.get("/status")
 async def get_sync_status(
     current_user: dict = Depends(get_current_user)
@@ -59,64 +127,54 @@ async def get_sync_status(
     }
 
 
-@router.post("/push")
+@router.post("/push", openapi_extra=body_openapi(sync_push_adapter))
 async def push_sync(
-    sync_data: SyncPushRequest,
+    request: Request,
+    sync_data: SyncPushPayload = Depends(negotiated_body(sync_push_adapter)),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_database()
     user_id = current_user["_id"]
     
-    investments_created = 0
-    investments_updated = 0
+    return await idempotent_response(
+        request,
+        user_id,
+        lambda: _apply_push(db, user_id, sync_data)
+    )
+
+
+async def _apply_push(db, user_id, sync_data: SyncPushPayload) -> dict:
+    investment_counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0}
     configs_created = 0
     configs_updated = 0
+    configs_unchanged = 0
     
     # Sincronizar inversiones
-    if sync_data.investments:
-        for investment in sync_data.investments:
-            existing = await db.investments.find_one({
-                "user_id": user_id,
-                "timestamp": investment.timestamp,
-                "entidad": investment.entidad
-            })
-            
-            if existing:
-                await db.investments.update_one(
-                    {"_id": existing["_id"]},
-                    {
-                        "$set": {
-                            "monto_ars": investment.monto_ars,
-                            "monto_usd": investment.monto_usd,
-                            "updated_at": datetime.utcnow()
-                        }
-                    }
-                )
-                investments_updated += 1
-            else:
-                investment_dict = investment.model_dump()
-                investment_dict["user_id"] = user_id
-                investment_dict["created_at"] = datetime.utcnow()
-                investment_dict["updated_at"] = datetime.utcnow()
-                await db.investments.insert_one(investment_dict)
-                investments_created += 1
+    if sync_data.get("investments"):
+        for record in with_defaults(sync_data["investments"]):
+            outcome, _ = await upsert_investment(db, user_id, record)
+            investment_counts[outcome] += 1
+        
+        invalidate_performance(user_id)
     
     # Sincronizar configuraciones de sitios
-    if sync_data.configSites:
-        for config in sync_data.configSites:
+    if sync_data.get("configSites"):
+        for config in sync_data["configSites"]:
             # Buscar por nombre y urlPattern
-            existing = await db.config_sites.find_one({
-                "user_id": user_id,
-                "name": config.name,
-                "urlPattern": config.urlPattern
-            })
+            existing = await db.config_sites.find_one(site_key_filter(user_id, config.name, config.urlPattern))
             
             if existing:
+                selectors = config.selectors.model_dump()
+                if existing.get("selectors") == selectors and existing.get("investment") == config.investment:
+                    # Sin cambios: no mover updated_at
+                    configs_unchanged += 1
+                    continue
+                
                 await db.config_sites.update_one(
                     {"_id": existing["_id"]},
                     {
                         "$set": {
-                            "selectors": config.selectors.model_dump(),
+                            "selectors": selectors,
                             "investment": config.investment,
                             "updated_at": datetime.utcnow()
                         }
@@ -130,24 +188,38 @@ async def push_sync(
                 config_dict["updated_at"] = datetime.utcnow()
                 await db.config_sites.insert_one(config_dict)
                 configs_created += 1
+        
+        if configs_created or configs_updated:
+            await invalidate_config_cache(db, user_id)
     
     # Actualizar preferencias si se proporcionan
-    if sync_data.preferences:
+    if sync_data.get("preferences"):
         await db.users.update_one(
             {"_id": user_id},
-            {"$set": {"preferences": sync_data.preferences}}
+            {"$set": {"preferences": sync_data["preferences"]}}
         )
     
+    log_sync_event(
+        user_id,
+        "push",
+        investment_counts[CREATED] + investment_counts[UPDATED] + configs_created + configs_updated,
+        investments_created=investment_counts[CREATED],
+        investments_updated=investment_counts[UPDATED],
+        unchanged=investment_counts[UNCHANGED] + configs_unchanged
+    )
+    
     return {
         "success": True,
         "synced": {
             "investments": {
-                "created": investments_created,
-                "updated": investments_updated
+                "created": investment_counts[CREATED],
+                "updated": investment_counts[UPDATED],
+                "unchanged": investment_counts[UNCHANGED]
             },
             "configSites": {
                 "created": configs_created,
-                "updated": configs_updated
+                "updated": configs_updated,
+                "unchanged": configs_unchanged
             }
         },
         "serverTimestamp": datetime.utcnow().isoformat()
@@ -156,50 +228,38 @@ async def push_sync(
 
 @router.get("/pull")
 async def pull_sync(
+    request: Request,
     since: Optional[int] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
+    return negotiated_response(request, await pull_payload(current_user, since))
+
+
+async def pull_payload(current_user: dict, since: Optional[int] = None) -> dict:
+    """Cuerpo de pull_sync (también lo usa /api/batch)"""
     db = get_database()
     user_id = current_user["_id"]
     
-    # Construir filtro de fecha si se proporciona
-    filter_query = {"user_id": user_id}
-    if since:
-        since_date = datetime.fromtimestamp(since / 1000)
-        filter_query["updated_at"] = {"$gte": since_date}
-    
     # Obtener inversiones
-    cursor = db.investments.find(filter_query).sort("updated_at", -1)
+    cursor = db.investments.find(changed_since_filter(user_id, since)).sort("updated_at", -1)
     investments = await cursor.to_list(length=None)
     
     for inv in investments:
-        inv["id"] = str(inv.pop("_id"))
-        inv["user_id"] = str(inv["user_id"])
-        # Convertir fechas a ISO string
-        if "created_at" in inv:
-            inv["created_at"] = inv["created_at"].isoformat()
-        if "updated_at" in inv:
-            inv["updated_at"] = inv["updated_at"].isoformat()
+        # Convertir ids y fechas a string
+        serialize_document(inv, iso_dates=True)
     
     # Obtener configuraciones de sitios
-    config_filter = {"user_id": user_id}
-    if since:
-        config_filter["updated_at"] = {"$gte": since_date}
-    
-    cursor = db.config_sites.find(config_filter).sort("updated_at", -1)
+    cursor = db.config_sites.find(changed_since_filter(user_id, since)).sort("updated_at", -1)
     config_sites = await cursor.to_list(length=None)
     
     for site in config_sites:
-        site["id"] = str(site.pop("_id"))
-        site["user_id"] = str(site["user_id"])
-        if "created_at" in site:
-            site["created_at"] = site["created_at"].isoformat()
-        if "updated_at" in site:
-            site["updated_at"] = site["updated_at"].isoformat()
+        serialize_document(site, iso_dates=True)
     
     # Obtener preferencias
     preferences = current_user.get("preferences", {})
     
+    log_sync_event(user_id, "pull", len(investments) + len(config_sites), since=since)
+    
     return {
         "success": True,
         "data": {
@@ -213,41 +273,207 @@ async def pull_sync(
     }
 
 
+# Upload sessions: push de historiales grandes en chunks reanudables
+async def _get_upload_session(db, upload_id: str, user_id) -> dict:
+    try:
+        session_id = ObjectId(upload_id)
+    except InvalidId:
+        session_id = None
+    
+    session = None
+    if session_id is not None:
+        session = await db.upload_sessions.find_one({"_id": session_id, "user_id": user_id})
+    
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sesión de carga no encontrada o expirada"
+        )
+    return session
+
+
+def _upload_state(session: dict) -> dict:
+    received = sorted(session["received"])
+    state = {
+        "uploadId": str(session["_id"]),
+        "status": session["status"],
+        "totalChunks": session.get("total_chunks"),
+        "receivedChunks": received,
+        "investments": session["counts"],
+        "expiresAt": session["expires_at"].isoformat()
+    }
+    if session.get("total_chunks"):
+        state["missingChunks"] = sorted(set(range(session["total_chunks"])) - set(received))
+    return state
+
+
+@router.post("/uploads")
+async def open_upload(
+    upload: UploadOpenRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    db = get_database()
+    now = datetime.utcnow()
+    
+    session = {
+        "user_id": current_user["_id"],
+        "status": "open",
+        "total_chunks": upload.totalChunks,
+        "client_timestamp": upload.clientTimestamp,
+        "received": [],
+        "counts": {CREATED: 0, UPDATED: 0, UNCHANGED: 0},
+        "created_at": now,
+        "expires_at": now + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    }
+    await db.upload_sessions.insert_one(session)
+    
+    return {
+        "success": True,
+        "data": {
+            **_upload_state(session),
+            "maxChunkRecords": settings.UPLOAD_MAX_CHUNK_RECORDS,
+            "maxChunkBytes": settings.UPLOAD_MAX_CHUNK_BYTES
+        }
+    }
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    db = get_database()
+    session = await _get_upload_session(db, upload_id, current_user["_id"])
+    
+    return {
+        "success": True,
+        "data": _upload_state(session)
+    }
+
+
+@router.put(
+    "/uploads/{upload_id}/chunks/{index}",
+    openapi_extra=body_openapi(upload_chunk_adapter)
+)
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    chunk: UploadChunkPayload = Depends(
+        negotiated_body(upload_chunk_adapter, max_bytes=settings.UPLOAD_MAX_CHUNK_BYTES)
+    ),
+    current_user: dict = Depends(get_current_user)
+):
+    db = get_database()
+    user_id = current_user["_id"]
+    session = await _get_upload_session(db, upload_id, user_id)
+    
+    if session["status"] != "open":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La sesión de carga ya fue confirmada"
+        )
+    if index < 0 or (session.get("total_chunks") and index >= session["total_chunks"]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Número de chunk fuera de rango"
+        )
+    
+    # Chunk ya recibido (reintento tras un corte): no reprocesar
+    if index in session["received"]:
+        return {"success": True, "data": {"index": index, "duplicate": True}}
+    
+    counts = {CREATED: 0, UPDATED: 0, UNCHANGED: 0}
+    for record in with_defaults(chunk["investments"]):
+        outcome, _ = await upsert_investment(db, user_id, record)
+        counts[outcome] += 1
+    
+    # Sólo se cuenta una vez aunque lleguen dos copias del chunk a la vez;
+    # los upserts repetidos son idempotentes
+    await db.upload_sessions.update_one(
+        {"_id": session["_id"], "received": {"$ne": index}},
+        {
+            "$addToSet": {"received": index},
+            "$inc": {f"counts.{key}": value for key, value in counts.items()}
+        }
+    )
+    
+    if counts[CREATED] or counts[UPDATED]:
+        invalidate_performance(user_id)
+    
+    return {
+        "success": True,
+        "data": {"index": index, "duplicate": False, "investments": counts}
+    }
+
+
+@router.post("/uploads/{upload_id}/commit")
+async def commit_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    db = get_database()
+    user_id = current_user["_id"]
+    session = await _get_upload_session(db, upload_id, user_id)
+    state = _upload_state(session)
+    
+    if state.get("missingChunks"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Faltan chunks", "missingChunks": state["missingChunks"]}
+        )
+    
+    if session["status"] == "open":
+        await db.upload_sessions.update_one(
+            {"_id": session["_id"]},
+            {"$set": {"status": "committed", "committed_at": datetime.utcnow()}}
+        )
+        counts = session["counts"]
+        log_sync_event(
+            user_id,
+            "upload",
+            counts[CREATED] + counts[UPDATED],
+            chunks=len(session["received"]),
+            unchanged=counts[UNCHANGED]
+        )
+        state["status"] = "committed"
+    
+    return {
+        "success": True,
+        "data": state,
+        "serverTimestamp": datetime.utcnow().isoformat()
+    }
+
+
 @router.get("/export")
 async def export_data(
+    request: Request,
+    export_format: Optional[str] = Query(None, alias="format", pattern="^(json|parquet|arrow)$"),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_database()
     user_id = current_user["_id"]
     
+    if export_format in columnar.FORMATS:
+        return await _export_columnar(db, current_user, export_format)
+    
     # Obtener todas las inversiones
     cursor = db.investments.find({"user_id": user_id}).sort("timestamp", -1)
     investments = await cursor.to_list(length=None)
     
     for inv in investments:
-        inv["id"] = str(inv.pop("_id"))
-        inv["user_id"] = str(inv["user_id"])
-        if "created_at" in inv:
-            inv["created_at"] = inv["created_at"].isoformat()
-        if "updated_at" in inv:
-            inv["updated_at"] = inv["updated_at"].isoformat()
+        serialize_document(inv, iso_dates=True)
     
     # Obtener todas las configuraciones
     cursor = db.config_sites.find({"user_id": user_id})
     config_sites = await cursor.to_list(length=None)
     
     for site in config_sites:
-        site["id"] = str(site.pop("_id"))
-        site["user_id"] = str(site["user_id"])
-        if "created_at" in site:
-            site["created_at"] = site["created_at"].isoformat()
-        if "updated_at" in site:
-            site["updated_at"] = site["updated_at"].isoformat()
+        serialize_document(site, iso_dates=True)
     
     # Obtener preferencias
     preferences = current_user.get("preferences", {})
     
-    return {
+    return negotiated_response(request, {
         "version": "1.0",
         "exportDate": datetime.utcnow().isoformat(),
         "user": {
@@ -258,12 +484,39 @@ async def export_data(
             "configSites": config_sites,
             "preferences": preferences
         }
-    }
+    })
 
 
-@router.post("/import")
+async def _export_columnar(db, current_user: dict, export_format: str):
+    """Inversiones como tabla Parquet/Arrow; configSites y preferencias van en la metadata"""
+    columnar.require_pyarrow()
+    user_id = current_user["_id"]
+    
+    cursor = db.config_sites.find({"user_id": user_id})
+    config_sites = [serialize_document(site, iso_dates=True) for site in await cursor.to_list(length=None)]
+    preferences = current_user.get("preferences", {})
+    metadata = columnar.export_metadata(current_user.get("email"), config_sites, preferences)
+    
+    cursor = db.investments.find(
+        {"user_id": user_id},
+        projection=columnar.PROJECTION,
+        batch_size=settings.COLUMNAR_BATCH_SIZE
+    ).sort("timestamp", -1)
+    
+    media_type = columnar.FORMATS[export_format]
+    return StreamingResponse(
+        columnar.stream_investments(cursor, media_type, metadata),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="investments.{export_format}"'}
+    )
+
+
+@router.post(
+    "/import",
+    openapi_extra=body_openapi(ImportRequest, binary_types=tuple(sorted(columnar.MEDIA_TYPES)))
+)
 async def import_data(
-    import_request: ImportRequest,
+    import_request: ImportRequest = Depends(import_body),
     current_user: dict = Depends(get_current_user)
 ):
     db = get_database()
@@ -276,6 +529,8 @@ async def import_data(
     if import_request.mode == "replace":
         await db.investments.delete_many({"user_id": user_id})
         await db.config_sites.delete_many({"user_id": user_id})
+        await invalidate_config_cache(db, user_id)
+        invalidate_performance(user_id)
     
     # Importar inversiones
     if import_request.data.investments:
@@ -287,21 +542,23 @@ async def import_data(
             
             # Si es merge, verificar si existe
             if import_request.mode == "merge":
-                existing = await db.investments.find_one({
-                    "user_id": user_id,
-                    "timestamp": inv_data.get("timestamp"),
-                    "entidad": inv_data.get("entidad")
-                })
+                existing = await db.investments.find_one(
+                    key_filter(user_id, inv_data.get("timestamp"), inv_data.get("entidad"))
+                )
                 
                 if existing:
                     continue  # Ya existe, saltar
             
             # Insertar
+            if "timestamp" in inv_data:
+                inv_data.update(valuations(inv_data))
             inv_data["user_id"] = user_id
             inv_data["created_at"] = datetime.utcnow()
             inv_data["updated_at"] = datetime.utcnow()
             await db.investments.insert_one(inv_data)
             investments_imported += 1
+        
+        invalidate_performance(user_id)
     
     # Importar configuraciones
     if import_request.data.configSites:
@@ -313,11 +570,9 @@ async def import_data(
             
             # Si es merge, verificar si existe
             if import_request.mode == "merge":
-                existing = await db.config_sites.find_one({
-                    "user_id": user_id,
-                    "name": config_data.get("name"),
-                    "urlPattern": config_data.get("urlPattern")
-                })
+                existing = await db.config_sites.find_one(
+                    site_key_filter(user_id, config_data.get("name"), config_data.get("urlPattern"))
+                )
                 
                 if existing:
                     continue  # Ya existe, saltar
@@ -328,6 +583,8 @@ async def import_data(
             config_data["updated_at"] = datetime.utcnow()
             await db.config_sites.insert_one(config_data)
             configs_imported += 1
+        
+        await invalidate_config_cache(db, user_id)
     
     # Importar preferencias (siempre reemplaza)
     if import_request.data.preferences:
@@ -336,6 +593,13 @@ async def import_data(
             {"$set": {"preferences": import_request.data.preferences}}
         )
     
+    log_sync_event(
+        user_id,
+        "import",
+        investments_imported + configs_imported,
+        mode=import_request.mode
+    )
+    
     return {
         "success": True,
         "imported": {
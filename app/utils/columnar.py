@@ -0,0 +1,178 @@
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from fastapi import HTTPException, status
+from app.config import settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # los formatos columnares son opcionales
+    pa = None
+    pq = None
+
+PARQUET = "application/vnd.apache.parquet"
+ARROW = "application/vnd.apache.arrow.stream"
+
+FORMATS = {"parquet": PARQUET, "arrow": ARROW}
+MEDIA_TYPES = {PARQUET, "application/x-parquet", ARROW, "application/vnd.apache.arrow.file"}
+
+INVESTMENT_FIELDS = ("timestamp", "entidad", "monto_ars", "monto_usd")
+PROJECTION = {"_id": 0, **{field: 1 for field in INVESTMENT_FIELDS}, "created_at": 1, "updated_at": 1}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Parquet/Arrow no está disponible en este servidor"
+        )
+
+
+def investment_schema(metadata: Optional[Dict[str, str]] = None) -> "pa.Schema":
+    return pa.schema([
+        ("timestamp", pa.int64()),
+        ("entidad", pa.dictionary(pa.int32(), pa.string())),
+        ("monto_ars", pa.float64()),
+        ("monto_usd", pa.float64()),
+        ("created_at", pa.timestamp("ms")),
+        ("updated_at", pa.timestamp("ms")),
+    ], metadata=metadata)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura que acumula bytes hasta que se drenan"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _record_batches(cursor, schema: "pa.Schema") -> AsyncIterator["pa.RecordBatch"]:
+    """
+    Arma record batches de COLUMNAR_BATCH_SIZE filas a medida que llegan del
+    cursor. `entidad` se codifica con un diccionario que sólo crece, así cada
+    batch agrega (delta) las entidades nuevas en lugar de repetirlas.
+    """
+    codes: Dict[str, int] = {}
+    columns = {name: [] for name in schema.names}
+
+    def build():
+        entidad = pa.DictionaryArray.from_arrays(
+            pa.array(columns["entidad"], type=pa.int32()),
+            pa.array(list(codes), type=pa.string())
+        )
+        arrays = [
+            entidad if name == "entidad" else pa.array(columns[name], type=schema.field(name).type)
+            for name in schema.names
+        ]
+        for values in columns.values():
+            values.clear()
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    async for doc in cursor:
+        columns["timestamp"].append(doc["timestamp"])
+        columns["entidad"].append(codes.setdefault(doc["entidad"], len(codes)))
+        columns["monto_ars"].append(doc.get("monto_ars"))
+        columns["monto_usd"].append(doc.get("monto_usd"))
+        columns["created_at"].append(doc.get("created_at"))
+        columns["updated_at"].append(doc.get("updated_at"))
+        if len(columns["timestamp"]) >= settings.COLUMNAR_BATCH_SIZE:
+            yield build()
+
+    if columns["timestamp"]:
+        yield build()
+
+
+async def stream_investments(cursor, media_type: str, metadata: Dict[str, str]) -> AsyncIterator[bytes]:
+    """Serializa el cursor a Parquet o Arrow IPC (stream) y lo emite por partes"""
+    schema = investment_schema({key: value.encode() for key, value in metadata.items()})
+    sink = _ChunkSink()
+
+    if media_type == PARQUET:
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(
+            sink, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        )
+
+    try:
+        async for batch in _record_batches(cursor, schema):
+            # Cada batch de Parquet queda como un row group
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def read_table(raw: bytes, media_type: str) -> "pa.Table":
+    """Lee un export Parquet o Arrow (stream o file)"""
+    require_pyarrow()
+    try:
+        if media_type in (PARQUET, "application/x-parquet"):
+            return pq.read_table(pa.BufferReader(raw))
+        if media_type == ARROW:
+            return pa.ipc.open_stream(raw).read_all()
+        return pa.ipc.open_file(pa.BufferReader(raw)).read_all()
+    except (pa.ArrowInvalid, OSError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archivo Parquet/Arrow inválido"
+        )
+
+
+def table_to_export_data(table: "pa.Table") -> dict:
+    """
+    Convierte una tabla exportada al formato de ExportData: las inversiones
+    salen de las columnas y configSites/preferences de la metadata del schema.
+    """
+    missing = [field for field in ("timestamp", "entidad") if field not in table.column_names]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Faltan columnas: {', '.join(missing)}"
+        )
+
+    columns = [field for field in INVESTMENT_FIELDS if field in table.column_names]
+    investments = table.select(columns).to_pylist()
+
+    metadata = table.schema.metadata or {}
+    config_sites = json.loads(metadata.get(b"configSites", b"[]"))
+    preferences = json.loads(metadata.get(b"preferences", b"null"))
+
+    return {
+        "investments": investments,
+        "configSites": config_sites,
+        "preferences": preferences
+    }
+
+
+def export_metadata(email: Optional[str], config_sites: list, preferences: dict) -> Dict[str, str]:
+    return {
+        "version": "1.0",
+        "exportDate": datetime.utcnow().isoformat(),
+        "email": email or "",
+        "configSites": json.dumps(config_sites, default=str),
+        "preferences": json.dumps(preferences, default=str)
+    }
@@ -0,0 +1,60 @@
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from pymongo import monitoring
+
+# Máximo de comandos guardados por request
+_MAX_COMMANDS = 200
+
+# Lista de comandos del request en curso (None = no se está trazando).
+# Motor ejecuta pymongo en threads copiando el contexto, así que los
+# listeners ven el valor del request que emitió el comando
+_trace: ContextVar[Optional[List[dict]]] = ContextVar("mongo_command_trace", default=None)
+
+
+def begin_trace():
+    return _trace.set([])
+
+
+def end_trace(token) -> List[dict]:
+    commands = _trace.get() or []
+    _trace.reset(token)
+    return commands
+
+
+class CommandTracer(monitoring.CommandListener):
+    """Registra nombre, colección, campos del filtro y duración de cada comando"""
+
+    def started(self, event):
+        commands = _trace.get()
+        if commands is None or len(commands) >= _MAX_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        query = command.get("filter") or command.get("query") or {}
+        commands.append({
+            "requestId": event.request_id,
+            "command": event.command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            # Sólo los nombres de los campos, nunca los valores
+            "filterKeys": sorted(query) if isinstance(query, dict) else [],
+            "at": time.monotonic(),
+            "ms": None,
+            "ok": None
+        })
+
+    def _finish(self, event, ok: bool):
+        commands = _trace.get()
+        if not commands:
+            return
+        for command in reversed(commands):
+            if command["requestId"] == event.request_id:
+                command["ms"] = event.duration_micros / 1000
+                command["ok"] = ok
+                return
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import msgpack
+from app.config import settings
+from app.utils.serialization import MSGPACK, encode_content, serialize_document
+from app.utils.site_matcher import invalidate_site_matcher
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # el backend compartido es opcional
+    redis = None
+
+SITES = "sites"
+# Campo de users que se incrementa en cada escritura de config_sites. Se lee
+# gratis con el usuario autenticado, así que todos los workers validan sus
+# entradas contra el mismo valor sin consultas extra
+GENERATION_FIELD = "config_generation"
+
+# Cache LRU local: (user_id, tipo) -> (generación, vencimiento, valor en msgpack).
+# Se guarda serializado para medir bytes y devolver siempre una copia
+_entries: "OrderedDict[Tuple[str, str], Tuple[int, float, bytes]]" = OrderedDict()
+_size = 0
+_client = None
+
+
+def _shared():
+    """Cliente Redis si CONFIG_CACHE_REDIS_URL está configurada"""
+    global _client
+    if _client is None and settings.CONFIG_CACHE_REDIS_URL:
+        if redis is None:
+            raise RuntimeError("CONFIG_CACHE_REDIS_URL requiere el paquete redis")
+        _client = redis.from_url(settings.CONFIG_CACHE_REDIS_URL)
+    return _client
+
+
+def config_generation(user: dict) -> int:
+    return user.get(GENERATION_FIELD, 0)
+
+
+def _redis_key(user_id: str, kind: str) -> str:
+    return f"config_cache:{user_id}:{kind}"
+
+
+async def _lookup(user_id: str, kind: str, generation: int) -> Optional[bytes]:
+    client = _shared()
+    if client is not None:
+        packed = await client.get(_redis_key(user_id, kind))
+        if packed is not None:
+            cached_generation, raw = msgpack.unpackb(packed, raw=False)
+            if cached_generation == generation:
+                return raw
+        return None
+
+    entry = _entries.get((user_id, kind))
+    if entry is not None and entry[0] == generation and entry[1] > time.monotonic():
+        _entries.move_to_end((user_id, kind))
+        return entry[2]
+    return None
+
+
+def _store_local(key: Tuple[str, str], generation: int, raw: bytes):
+    global _size
+    if len(raw) > settings.CONFIG_CACHE_MAX_BYTES:
+        return
+    old = _entries.pop(key, None)
+    if old is not None:
+        _size -= len(old[2])
+    _entries[key] = (generation, time.monotonic() + settings.CONFIG_CACHE_TTL_SECONDS, raw)
+    _size += len(raw)
+    while _size > settings.CONFIG_CACHE_MAX_BYTES:
+        _, (_, _, evicted) = _entries.popitem(last=False)
+        _size -= len(evicted)
+
+
+async def _store(user_id: str, kind: str, generation: int, raw: bytes):
+    client = _shared()
+    if client is not None:
+        # La generación viaja con el valor: una entrada de una generación
+        # anterior se ignora al leerla y vence sola
+        await client.set(
+            _redis_key(user_id, kind),
+            msgpack.packb([generation, raw], use_bin_type=True),
+            ex=settings.CONFIG_CACHE_TTL_SECONDS
+        )
+        return
+
+    _store_local((user_id, kind), generation, raw)
+
+
+async def _read_through(user: dict, kind: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    # La generación se leyó con el usuario, antes que los datos: si entra una
+    # escritura en el medio, lo cacheado queda con la generación vieja
+    key = str(user["_id"])
+    generation = config_generation(user)
+    raw = await _lookup(key, kind, generation)
+    if raw is not None:
+        return msgpack.unpackb(raw, raw=False)
+
+    value = await load()
+    await _store(key, kind, generation, encode_content(value, MSGPACK))
+    return value
+
+
+async def get_config_sites(db, user: dict) -> list:
+    """config_sites del usuario autenticado ya serializados (fechas en ISO)"""
+    async def load():
+        cursor = db.config_sites.find({"user_id": user["_id"]})
+        sites = await cursor.to_list(length=None)
+        return [serialize_document(site, iso_dates=True) for site in sites]
+
+    return await _read_through(user, SITES, load)
+
+
+async def invalidate_config_cache(db, user_id):
+    """
+    Invalida los config_sites cacheados del usuario (y su SiteMatcher) en
+    todos los workers. Llamar después de cualquier escritura en config_sites.
+    Las preferencias no se cachean: vienen con el usuario autenticado.
+    """
+    global _size
+    await db.users.update_one({"_id": user_id}, {"$inc": {GENERATION_FIELD: 1}})
+
+    # Las entradas locales ya no sirven: liberar la memoria
+    key = str(user_id)
+    invalidate_site_matcher(user_id)
+    entry = _entries.pop((key, SITES), None)
+    if entry is not None:
+        _size -= len(entry[2])
+
+
+async def close_config_cache():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,146 @@
+import asyncio
+from bisect import bisect_right
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from app.config import settings
+from app.database import get_database
+
+DAY_MS = 86400000
+
+# Tabla en memoria de fx_rates ordenada por timestamp (ARS por USD).
+# Se reemplaza entera al recargar, nunca se modifica en el lugar
+_timestamps: List[int] = []
+_rates: List[float] = []
+_task: Optional[asyncio.Task] = None
+
+
+def day_start(timestamp: int) -> int:
+    return timestamp - timestamp % DAY_MS
+
+
+async def load_fx_rates(db) -> int:
+    """Recarga la tabla desde la colección fx_rates"""
+    global _timestamps, _rates
+    cursor = db.fx_rates.find({}, {"_id": 0, "timestamp": 1, "ars_per_usd": 1}).sort("timestamp", 1)
+    rows = await cursor.to_list(length=None)
+    _timestamps, _rates = [row["timestamp"] for row in rows], [row["ars_per_usd"] for row in rows]
+    return len(rows)
+
+
+def rate_at(timestamp: int) -> Optional[float]:
+    """Última cotización publicada a la fecha `timestamp` (búsqueda binaria)"""
+    timestamps, rates = _timestamps, _rates
+    index = bisect_right(timestamps, timestamp) - 1
+    return rates[index] if index >= 0 else None
+
+
+def valuations(record: dict) -> dict:
+    """
+    valor_ars / valor_usd del registro: el monto propio si lo tiene, si no el
+    de la otra moneda convertido a la cotización del día del snapshot.
+    La cotización usada queda en fx_rate (ver VALUATION_STAGE).
+    """
+    ars = record.get("monto_ars")
+    usd = record.get("monto_usd")
+    rate = rate_at(record["timestamp"]) or None
+
+    valor_ars = ars
+    if valor_ars is None and usd is not None and rate:
+        valor_ars = usd * rate
+    valor_usd = usd
+    if valor_usd is None and ars is not None and rate:
+        valor_usd = ars / rate
+
+    return {"valor_ars": valor_ars, "valor_usd": valor_usd, "fx_rate": rate}
+
+
+# Etapa de update por pipeline equivalente a valuations() con el fx_rate
+# guardado en el registro: permite recalcular valor_* en el mismo update
+# que cambia los montos, sin leer el timestamp antes
+VALUATION_STAGE = {"$set": {
+    "valor_ars": {"$ifNull": ["$monto_ars", {"$multiply": ["$monto_usd", "$fx_rate"]}]},
+    "valor_usd": {"$ifNull": ["$monto_usd", {"$divide": ["$monto_ars", "$fx_rate"]}]}
+}}
+
+
+async def store_fx_rates(db, rows: Iterable[Tuple[int, float]], source: str = "local") -> int:
+    """Guarda cotizaciones diarias (timestamp ms, ARS por USD); pisa el día si ya existe"""
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"timestamp": day_start(timestamp)},
+            {"$set": {"ars_per_usd": rate, "source": source, "updated_at": now}},
+            upsert=True
+        )
+        for timestamp, rate in rows
+    ]
+    if not ops:
+        return 0
+    await db.fx_rates.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+# Lo que valuations() necesita más los valores guardados para comparar
+BACKFILL_PROJECTION = {"timestamp": 1, "monto_ars": 1, "monto_usd": 1, "valor_ars": 1, "valor_usd": 1, "fx_rate": 1}
+
+
+async def backfill_valuations(db, batch_size: int = 1000, pause: float = 0.05, user_id=None) -> dict:
+    """
+    Recalcula valor_ars/valor_usd de los registros existentes con la tabla
+    cargada. Sólo escribe los que cambian; pausa entre lotes.
+    """
+    query = {"user_id": user_id} if user_id is not None else {}
+    cursor = db.investments.find(query, BACKFILL_PROJECTION, batch_size=batch_size)
+
+    report = {"scanned": 0, "updated": 0}
+    pending = []
+    async for doc in cursor:
+        report["scanned"] += 1
+        values = valuations(doc)
+        if any(doc.get(field, ...) != value for field, value in values.items()):
+            pending.append(UpdateOne({"_id": doc["_id"]}, {"$set": values}))
+        if len(pending) >= batch_size:
+            await db.investments.bulk_write(pending, ordered=False)
+            report["updated"] += len(pending)
+            pending = []
+            await asyncio.sleep(pause)
+
+    if pending:
+        await db.investments.bulk_write(pending, ordered=False)
+        report["updated"] += len(pending)
+    return report
+
+
+async def _refresher():
+    while True:
+        await asyncio.sleep(settings.FX_RATES_REFRESH_MINUTES * 60)
+        db = get_database()
+        if db is None:
+            continue
+        try:
+            await load_fx_rates(db)
+        except Exception as e:
+            print(f"❌ Failed to reload fx_rates: {e}")
+
+
+async def start_fx_rates():
+    """Carga la tabla al iniciar y la recarga periódicamente (otros workers o el CLI la actualizan)"""
+    global _task
+    db = get_database()
+    if db is not None:
+        count = await load_fx_rates(db)
+        print(f"💱 {count} fx rates loaded")
+    if _task is None and settings.FX_RATES_REFRESH_MINUTES > 0:
+        _task = asyncio.create_task(_refresher())
+
+
+async def stop_fx_rates():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Tuple
+import msgpack
+from bson import Binary
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.database import get_database
+from app.utils.serialization import MSGPACK, encode_content, negotiated_response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+# Espera entre consultas mientras otra ejecución con la misma key está en curso
+_POLL_MIN_SECONDS = 0.05
+_POLL_MAX_SECONDS = 0.5
+
+
+def _conflict():
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=f"{IDEMPOTENCY_HEADER} ya usada con un cuerpo distinto"
+    )
+
+
+def takeover_filter(key: dict, fingerprint: str, now: datetime) -> dict:
+    """Key en curso cuyo dueño murió sin terminar (venció locked_until)"""
+    return {"_id": key, "fingerprint": fingerprint, "status": IN_PROGRESS, "locked_until": {"$lt": now}}
+
+
+async def _claim(db, key: dict, fingerprint: str) -> bool:
+    """
+    Intenta tomar la key: inserta el documento "en curso" o, si el worker que
+    la tenía murió (venció locked_until), se la apropia. True si la tomó.
+    """
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": key,
+            "fingerprint": fingerprint,
+            "status": IN_PROGRESS,
+            "locked_until": locked_until,
+            "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        })
+        return True
+    except DuplicateKeyError:
+        pass
+
+    taken = await db.idempotency_keys.find_one_and_update(
+        takeover_filter(key, fingerprint, now),
+        {"$set": {"locked_until": locked_until}},
+        projection={"_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return taken is not None
+
+
+async def run_idempotent(
+    key: dict,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]]
+) -> Tuple[Any, bool]:
+    """
+    Ejecuta `handler` una sola vez por key, entre todos los workers: la key
+    vive en la colección idempotency_keys (TTL por expires_at).
+    Devuelve (resultado, replayed). Las llamadas concurrentes con la misma key
+    esperan a la primera ejecución; si ésta falla, nada queda guardado.
+    """
+    db = get_database()
+    delay = _POLL_MIN_SECONDS
+    while not await _claim(db, key, fingerprint):
+        stored = await db.idempotency_keys.find_one({"_id": key})
+        if stored is None:
+            continue  # la ejecución original falló: reintentar
+        if stored["fingerprint"] != fingerprint:
+            raise _conflict()
+        if stored["status"] == DONE:
+            return msgpack.unpackb(stored["response"], raw=False), True
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _POLL_MAX_SECONDS)
+
+    try:
+        result = await handler()
+    except BaseException:
+        await db.idempotency_keys.delete_one({"_id": key, "status": IN_PROGRESS})
+        raise
+
+    await db.idempotency_keys.update_one(
+        {"_id": key},
+        {
+            "$set": {"status": DONE, "response": Binary(encode_content(result, MSGPACK))},
+            "$unset": {"locked_until": ""}
+        }
+    )
+    return result, False
+
+
+async def idempotent_response(
+    request: Request,
+    user_id,
+    handler: Callable[[], Awaitable[Any]]
+):
+    """
+    Si el request trae Idempotency-Key, devuelve la respuesta guardada para esa
+    key en lugar de volver a procesar el payload.
+    """
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not idempotency_key:
+        return negotiated_response(request, await handler())
+
+    body = await request.body()
+    fingerprint = hashlib.sha256(body).hexdigest()
+    key = {"user_id": str(user_id), "path": request.url.path, "key": idempotency_key}
+
+    content, replayed = await run_idempotent(key, fingerprint, handler)
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return negotiated_response(request, content, headers=headers)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from app.utils.metrics import increment
+from app.utils.fx_rates import valuations
+
+CREATED = "created"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+# Campos de contenido: si no cambian, no se toca updated_at
+CONTENT_FIELDS = ("monto_ars", "monto_usd")
+
+
+def key_filter(user_id, timestamp: int, entidad: str) -> dict:
+    """Un registro por (user_id, timestamp, entidad): usa el índice único"""
+    return {"user_id": user_id, "timestamp": timestamp, "entidad": entidad}
+
+
+async def upsert_investment(db, user_id, record: dict):
+    """
+    Crea o actualiza el registro (user_id, timestamp, entidad).
+    Si el contenido no cambió no escribe nada, así updated_at no se mueve y
+    el próximo pull_sync no lo vuelve a descargar.
+    Devuelve (CREATED | UPDATED | UNCHANGED, _id).
+    """
+    existing = await db.investments.find_one(
+        key_filter(user_id, record["timestamp"], record["entidad"]),
+        projection=dict.fromkeys(CONTENT_FIELDS, 1)
+    )
+
+    if existing:
+        changes = {
+            field: record.get(field)
+            for field in CONTENT_FIELDS
+            if existing.get(field) != record.get(field)
+        }
+        if not changes:
+            increment("investment_writes_skipped")
+            return UNCHANGED, existing["_id"]
+
+        # valor_ars / valor_usd se recalculan junto con los montos
+        changes.update(valuations(record))
+        changes["updated_at"] = datetime.utcnow()
+        await db.investments.update_one(
+            {"_id": existing["_id"]},
+            {"$set": changes}
+        )
+        increment("investment_writes_updated")
+        return UPDATED, existing["_id"]
+
+    investment_dict = dict(record)
+    investment_dict.update(valuations(record))
+    investment_dict["user_id"] = user_id
+    investment_dict["created_at"] = datetime.utcnow()
+    investment_dict["updated_at"] = investment_dict["created_at"]
+
+    result = await db.investments.insert_one(investment_dict)
+    increment("investment_writes_created")
+    return CREATED, result.inserted_id
@@ -0,0 +1,12 @@
+from collections import Counter
+
+# Contadores en memoria del proceso (por worker)
+_counters: Counter = Counter()
+
+
+def increment(name: str, amount: int = 1):
+    _counters[name] += amount
+
+
+def snapshot() -> dict:
+    return dict(_counters)
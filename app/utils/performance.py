@@ -0,0 +1,202 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+
+YEAR_MS = 365.25 * 86400000
+
+# Cache LRU: (user_id, series) -> (versión de los datos, resultado)
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+# Las filas se agrupan en el servidor por (entidad, ventana de 30 días): cada
+# documento trae arrays en lugar de un documento por fila, y la ventana lo
+# mantiene lejos del límite de 16 MB por documento
+GROUP_WINDOW_MS = 30 * 86400000
+
+
+def columns_pipeline(user_id) -> list:
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": {
+                "entidad": "$entidad",
+                "window": {"$floor": {"$divide": ["$timestamp", GROUP_WINDOW_MS]}}
+            },
+            "timestamp": {"$push": "$timestamp"},
+            # $ifNull: que un campo ausente empuje null y los arrays queden alineados
+            "monto_ars": {"$push": {"$ifNull": ["$monto_ars", None]}},
+            "monto_usd": {"$push": {"$ifNull": ["$monto_usd", None]}}
+        }}
+    ]
+
+
+async def load_columns(db, user_id) -> dict:
+    """
+    Trae (timestamp, entidad, monto_ars, monto_usd) del usuario como arrays,
+    ordenados por timestamp. Decodificar unos pocos documentos con arrays es
+    mucho más barato que un documento (dict de Python) por fila.
+    """
+    cursor = db.investments.aggregate(columns_pipeline(user_id), allowDiskUse=True)
+    return columns_from_groups(await cursor.to_list(length=None))
+
+
+def columns_from_groups(groups: List[dict]) -> dict:
+    # Las entidades se codifican como enteros al leer para no ordenar strings
+    codes: Dict[str, int] = {}
+    timestamps, entidades, ars, usd = [], [], [], []
+    for group in groups:
+        t = np.asarray(group["timestamp"], dtype=np.int64)
+        timestamps.append(t)
+        entidades.append(np.full(t.size, codes.setdefault(group["_id"]["entidad"], len(codes)), dtype=np.int32))
+        # None -> NaN
+        ars.append(np.asarray(group["monto_ars"], dtype=np.float64))
+        usd.append(np.asarray(group["monto_usd"], dtype=np.float64))
+
+    if not timestamps:
+        return {
+            "names": [],
+            "timestamp": np.empty(0, dtype=np.int64),
+            "entidad": np.empty(0, dtype=np.int32),
+            "monto_ars": np.empty(0, dtype=np.float64),
+            "monto_usd": np.empty(0, dtype=np.float64)
+        }
+
+    # $push no garantiza orden: ordenar por timestamp acá (vectorizado)
+    timestamp = np.concatenate(timestamps)
+    order = np.argsort(timestamp, kind="stable")
+    return {
+        "names": list(codes),
+        "timestamp": timestamp[order],
+        "entidad": np.concatenate(entidades)[order],
+        "monto_ars": np.concatenate(ars)[order],
+        "monto_usd": np.concatenate(usd)[order]
+    }
+
+
+def _number(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def series_metrics(timestamps: np.ndarray, values: np.ndarray) -> Optional[dict]:
+    """Retorno del período, CAGR, máximo drawdown y volatilidad anualizada"""
+    mask = np.isfinite(values) & (values > 0)
+    t = timestamps[mask]
+    v = values[mask]
+    if v.size == 0:
+        return None
+
+    years = (t[-1] - t[0]) / YEAR_MS
+    period_return = v[-1] / v[0] - 1
+    cagr = None
+    if years > 0:
+        # Con historias de pocos segundos el exponente desborda: queda inf -> None
+        with np.errstate(over="ignore"):
+            cagr = np.float64(v[-1] / v[0]) ** (1 / years) - 1
+    drawdown = v / np.maximum.accumulate(v) - 1
+
+    volatility = None
+    if v.size > 2 and years > 0:
+        log_returns = np.diff(np.log(v))
+        periods_per_year = log_returns.size / years
+        volatility = log_returns.std(ddof=1) * np.sqrt(periods_per_year)
+
+    return {
+        "first": _number(v[0]),
+        "last": _number(v[-1]),
+        "from": int(t[0]),
+        "to": int(t[-1]),
+        "observations": int(v.size),
+        "periodReturn": _number(period_return),
+        "cagr": None if cagr is None else _number(cagr),
+        "maxDrawdown": _number(drawdown.min()),
+        "volatility": None if volatility is None else _number(volatility)
+    }
+
+
+def compute_performance(columns: dict, include_series: bool = False) -> dict:
+    timestamps = columns["timestamp"]
+    if timestamps.size == 0:
+        return {"entities": {}, "records": 0}
+
+    # Agrupar por entidad manteniendo el orden por timestamp dentro de cada grupo
+    names = columns["names"]
+    codes = columns["entidad"]
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+
+    ars_all = columns["monto_ars"][order]
+    usd_all = columns["monto_usd"][order]
+    ts_all = timestamps[order]
+
+    entities = {}
+    for i, name in enumerate(names):
+        group = slice(bounds[i], bounds[i + 1])
+        t, ars, usd = ts_all[group], ars_all[group], usd_all[group]
+
+        # Tipo de cambio implícito donde hay ambos montos
+        both = np.isfinite(ars) & np.isfinite(usd) & (usd > 0)
+        rate = ars[both] / usd[both]
+        implied = None
+        if rate.size:
+            implied = {
+                "last": _number(rate[-1]),
+                "min": _number(rate.min()),
+                "max": _number(rate.max()),
+                "change": _number(rate[-1] / rate[0] - 1)
+            }
+            if include_series:
+                implied["series"] = {
+                    "timestamp": t[both].tolist(),
+                    "rate": rate.tolist()
+                }
+
+        entities[name] = {
+            "ars": series_metrics(t, ars),
+            "usd": series_metrics(t, usd),
+            "impliedRate": implied
+        }
+
+    return {"entities": entities, "records": int(timestamps.size)}
+
+
+async def data_version(db, user_id) -> tuple:
+    """
+    Versión de los investments del usuario que ven todos los workers:
+    (cantidad, último updated_at). Cambia con cualquier alta, edición o borrado.
+    """
+    count, last = await asyncio.gather(
+        db.investments.count_documents({"user_id": user_id}),
+        db.investments.find_one(
+            {"user_id": user_id},
+            projection={"_id": 0, "updated_at": 1},
+            sort=[("updated_at", -1)]
+        )
+    )
+    return count, (last or {}).get("updated_at")
+
+
+def get_cached_performance(user_id, include_series: bool, version: tuple) -> Optional[dict]:
+    key = (str(user_id), include_series)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != version:
+        return None
+    _cache.move_to_end(key)
+    return entry[1]
+
+
+def cache_performance(user_id, include_series: bool, result: dict, version: tuple):
+    key = (str(user_id), include_series)
+    _cache[key] = (version, result)
+    _cache.move_to_end(key)
+    while len(_cache) > settings.PERFORMANCE_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def invalidate_performance(user_id):
+    """Libera las entradas del usuario en este worker (los demás las descartan por versión)"""
+    key = str(user_id)
+    _cache.pop((key, False), None)
+    _cache.pop((key, True), None)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, List, Optional
+from app.config import settings
+
+
+def _stack(frame) -> str:
+    """Stack del frame en formato "collapsed" (raíz;...;hoja)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def collapsed(samples: Counter) -> str:
+    """Formato de flamegraph.pl / speedscope: una línea "stack cantidad" por stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class StackSampler(threading.Thread):
+    """
+    Toma el stack de un thread (el del event loop) cada `interval` segundos.
+    Corre en su propio thread, así ve lo que el loop está ejecutando incluso
+    cuando está bloqueado.
+    """
+
+    def __init__(self, thread_id: int, interval: float, on_sample: Callable[[float, str], None]):
+        super().__init__(name="stack-sampler", daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._on_sample = on_sample
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._on_sample(time.monotonic(), _stack(frame))
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+# Profiling a demanda (un perfil por vez en cada worker)
+_profile_lock = asyncio.Lock()
+
+
+def profile_running() -> bool:
+    return _profile_lock.locked()
+
+
+async def sample_profile(seconds: float, interval_ms: float) -> Counter:
+    """Samplea el event loop de este worker durante `seconds`"""
+    samples: Counter = Counter()
+    async with _profile_lock:
+        sampler = StackSampler(
+            threading.get_ident(),
+            interval_ms / 1000,
+            lambda _, stack: samples.update((stack,))
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, sampler.stop)
+    return samples
+
+
+# Sampler continuo para perfiles de requests lentos: los últimos
+# SLOW_REQUEST_WINDOW_SECONDS de samples quedan en un ring buffer
+_ring: deque = deque()
+_sampler: Optional[StackSampler] = None
+
+
+def samples_between(start: float, end: float) -> Counter:
+    """
+    Samples tomados entre start y end (time.monotonic). Incluye todo lo que
+    corrió en el loop en ese intervalo, también otros requests concurrentes.
+    """
+    return Counter(stack for at, stack in list(_ring) if start <= at <= end)
+
+
+def start_slow_request_profiler():
+    global _ring, _sampler
+    if settings.SLOW_REQUEST_MS <= 0 or _sampler is not None:
+        return
+    interval = settings.SLOW_REQUEST_SAMPLE_INTERVAL_MS / 1000
+    _ring = deque(maxlen=max(int(settings.SLOW_REQUEST_WINDOW_SECONDS / interval), 1))
+    _sampler = StackSampler(threading.get_ident(), interval, lambda at, stack: _ring.append((at, stack)))
+    _sampler.start()
+
+
+async def stop_slow_request_profiler():
+    global _sampler
+    if _sampler is not None:
+        await asyncio.get_running_loop().run_in_executor(None, _sampler.stop)
+        _sampler = None
+
+
+# Almacén en disco de perfiles de requests lentos, acotado a
+# SLOW_REQUEST_MAX_PROFILES archivos (se borran los más viejos)
+_NAME = re.compile(r"^[\w.-]+\.json$")
+
+
+def save_slow_request(entry: dict) -> str:
+    directory = settings.SLOW_REQUEST_PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    route = re.sub(r"[^\w]+", "_", entry["path"]).strip("_") or "root"
+    name = f"{int(entry['startedAt'] * 1000)}-{os.getpid()}-{entry['method']}-{route}.json"
+    with open(os.path.join(directory, name), "w") as f:
+        json.dump(entry, f)
+
+    stored = sorted(list_slow_requests(), key=lambda item: item["name"])
+    for item in stored[:max(len(stored) - settings.SLOW_REQUEST_MAX_PROFILES, 0)]:
+        try:
+            os.remove(os.path.join(directory, item["name"]))
+        except FileNotFoundError:
+            pass  # lo borró otro worker
+    return name
+
+
+def list_slow_requests() -> List[dict]:
+    directory = settings.SLOW_REQUEST_PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    stored = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not _NAME.match(name):
+            continue
+        try:
+            stored.append({"name": name, "bytes": os.path.getsize(os.path.join(directory, name))})
+        except FileNotFoundError:
+            pass
+    return stored
+
+
+def read_slow_request(name: str) -> Optional[dict]:
+    path = os.path.join(settings.SLOW_REQUEST_PROFILE_DIR, name)
+    if not _NAME.match(name) or not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,226 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo import DeleteMany
+from pymongo.errors import DuplicateKeyError
+from app.config import settings
+from app.database import get_database
+from app.utils.performance import invalidate_performance
+
+DAY_MS = 86400000
+
+_task: Optional[asyncio.Task] = None
+_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def retention_policy(user: dict) -> dict:
+    """
+    Política efectiva del usuario: sus overrides sobre los valores por defecto.
+    `enabled` sólo es True si además RETENTION_ENABLED está activo en el
+    servidor; `userEnabled` es lo que eligió el usuario.
+    """
+    policy = {
+        "enabled": True,
+        "fullDays": settings.RETENTION_FULL_DAYS,
+        "dailyDays": settings.RETENTION_DAILY_DAYS
+    }
+    policy.update({k: v for k, v in (user.get("retention") or {}).items() if v is not None})
+    policy["userEnabled"] = policy["enabled"]
+    policy["enabled"] = settings.RETENTION_ENABLED and policy["userEnabled"]
+    return policy
+
+
+def _tiers(policy: dict, now_ms: int) -> List[tuple]:
+    """
+    Rangos [desde, hasta) de timestamps a compactar y su unidad:
+    - entre fullDays y dailyDays atrás: último valor por día
+    - más viejos que dailyDays: último valor por mes
+    """
+    full_cutoff = now_ms - policy["fullDays"] * DAY_MS
+    daily_cutoff = now_ms - max(policy["dailyDays"], policy["fullDays"]) * DAY_MS
+    tiers = []
+    if daily_cutoff < full_cutoff:
+        tiers.append(("day", daily_cutoff, full_cutoff))
+    tiers.append(("month", None, daily_cutoff))
+    return tiers
+
+
+def _bucket_end(start: datetime, unit: str) -> datetime:
+    if unit == "day":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def _to_ms(value: datetime) -> int:
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def buckets_pipeline(user_id, unit: str, start_ms: Optional[int], end_ms: int) -> list:
+    """Agrupa los registros del rango por (entidad, día|mes); sólo buckets con más de uno"""
+    timestamp_filter = {"$lt": end_ms}
+    if start_ms is not None:
+        timestamp_filter["$gte"] = start_ms
+
+    return [
+        {"$match": {"user_id": user_id, "timestamp": timestamp_filter}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {
+                "entidad": "$entidad",
+                "bucket": {"$dateTrunc": {"date": {"$toDate": "$timestamp"}, "unit": unit}}
+            },
+            "keep": {"$last": "$_id"},
+            "count": {"$sum": 1},
+            "bytes": {"$sum": {"$bsonSize": "$$ROOT"}},
+            "keep_bytes": {"$last": {"$bsonSize": "$$ROOT"}}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ]
+
+
+def bucket_delete_filter(user_id, bucket: dict) -> dict:
+    """Todo el bucket menos el registro que se conserva"""
+    return {
+        "user_id": user_id,
+        "entidad": bucket["entidad"],
+        "timestamp": {"$gte": bucket["from"], "$lt": bucket["to"]},
+        "_id": {"$ne": bucket["keep"]}
+    }
+
+
+def lease_filter(owner: str, now: datetime) -> dict:
+    """El lease es nuestro o venció"""
+    return {"_id": "retention", "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]}
+
+
+# Usuarios a compactar: los que no la apagaron explícitamente
+ENABLED_USERS = {"retention.enabled": {"$ne": False}}
+
+
+async def _compactable_buckets(db, user_id, unit: str, start_ms: Optional[int], end_ms: int):
+    """
+    Devuelve los buckets del rango con más de un registro, junto al _id del
+    último (el que se conserva).
+    """
+    pipeline = buckets_pipeline(user_id, unit, start_ms, end_ms)
+    async for bucket in db.investments.aggregate(pipeline, allowDiskUse=True):
+        bucket_start = bucket["_id"]["bucket"]
+        low = _to_ms(bucket_start)
+        high = _to_ms(_bucket_end(bucket_start, unit))
+        if start_ms is not None:
+            low = max(low, start_ms)
+        yield {
+            "entidad": bucket["_id"]["entidad"],
+            "from": low,
+            "to": min(high, end_ms),
+            "keep": bucket["keep"],
+            "rows": bucket["count"] - 1,
+            "bytes": bucket["bytes"] - bucket["keep_bytes"]
+        }
+
+
+async def compact_user(db, user: dict, dry_run: bool = False, now_ms: Optional[int] = None) -> dict:
+    """
+    Compacta los snapshots viejos de un usuario conservando el último valor
+    por bucket. Los registros conservados mantienen su timestamp original, así
+    que los filtros dateFrom/dateTo de get_investments siguen siendo válidos.
+    Con dry_run sólo informa lo que se recuperaría, aunque la retención esté
+    apagada: el reporte sirve para decidir si activarla.
+    """
+    policy = retention_policy(user)
+    report = {"rows": 0, "bytes": 0, "buckets": 0, "policy": policy}
+    if not policy["enabled"] and not dry_run:
+        return report
+
+    if now_ms is None:
+        now_ms = _to_ms(datetime.utcnow())
+    user_id = user["_id"]
+    pending = []
+
+    async def flush():
+        if pending and not dry_run:
+            await db.investments.bulk_write(pending, ordered=False)
+            # Ceder a otras tareas entre lotes
+            await asyncio.sleep(settings.RETENTION_BATCH_PAUSE_SECONDS)
+        pending.clear()
+
+    for unit, start_ms, end_ms in _tiers(policy, now_ms):
+        async for bucket in _compactable_buckets(db, user_id, unit, start_ms, end_ms):
+            report["rows"] += bucket["rows"]
+            report["bytes"] += bucket["bytes"]
+            report["buckets"] += 1
+            pending.append(DeleteMany(bucket_delete_filter(user_id, bucket)))
+            if len(pending) >= settings.RETENTION_BATCH_SIZE:
+                await flush()
+
+    await flush()
+    if report["rows"] and not dry_run:
+        invalidate_performance(user_id)
+    return report
+
+
+async def _acquire_lease(db) -> bool:
+    """Evita que varios workers compacten a la vez"""
+    now = datetime.utcnow()
+    try:
+        await db.locks.update_one(
+            lease_filter(_owner, now),
+            {"$set": {
+                "owner": _owner,
+                "expires_at": now + timedelta(hours=settings.RETENTION_INTERVAL_HOURS)
+            }},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def run_compaction():
+    db = get_database()
+    if db is None or not await _acquire_lease(db):
+        return
+
+    total = {"users": 0, "rows": 0, "bytes": 0}
+    cursor = db.users.find(ENABLED_USERS, {"retention": 1})
+    async for user in cursor:
+        try:
+            report = await compact_user(db, user)
+        except Exception as e:
+            print(f"❌ Retention compaction failed for user {user['_id']}: {e}")
+            continue
+        total["users"] += 1
+        total["rows"] += report["rows"]
+        total["bytes"] += report["bytes"]
+
+    print(f"🧹 Retention compaction: {total['rows']} rows / {total['bytes']} bytes from {total['users']} users")
+
+
+async def _scheduler():
+    while True:
+        try:
+            await run_compaction()
+        except Exception as e:
+            print(f"❌ Retention compaction failed: {e}")
+        await asyncio.sleep(settings.RETENTION_INTERVAL_HOURS * 3600)
+
+
+def start_retention_scheduler():
+    global _task
+    if settings.RETENTION_ENABLED and _task is None:
+        _task = asyncio.create_task(_scheduler())
+
+
+async def stop_retention_scheduler():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,235 @@
+from fastapi import HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Optional, Type, Union
+import msgpack
+
+try:
+    import cbor2
+except ImportError:  # CBOR es opcional
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Alias aceptados en Content-Type / Accept
+_MEDIA_ALIASES = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/cbor": CBOR,
+}
+
+
+def _media_type(header_value: Optional[str]) -> Optional[str]:
+    if not header_value:
+        return None
+    return header_value.split(";", 1)[0].strip().lower()
+
+
+def _default(value: Any) -> Any:
+    """Tipos que msgpack/cbor no saben serializar por sí mismos"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _cbor_default(encoder, value):
+    encoder.encode(_default(value))
+
+
+def _accepted_binary_type(accept: Optional[str]) -> Optional[str]:
+    """Devuelve MSGPACK o CBOR si el cliente los prefiere sobre JSON"""
+    if not accept:
+        return None
+
+    best = None
+    best_q = 0.0
+    for item in accept.split(","):
+        parts = item.split(";")
+        media = _MEDIA_ALIASES.get(parts[0].strip().lower())
+        if media is None:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media == CBOR and cbor2 is None:
+            continue
+        # A igual calidad gana el primero listado
+        if q > best_q:
+            best, best_q = media, q
+
+    return best if best in (MSGPACK, CBOR) else None
+
+
+def decode_payload(raw: bytes, media_type: Optional[str]) -> Any:
+    """Decodifica un cuerpo msgpack/cbor a objetos Python"""
+    media = _MEDIA_ALIASES.get(media_type)
+    try:
+        if media == MSGPACK:
+            return msgpack.unpackb(raw, raw=False)
+        if media == CBOR:
+            if cbor2 is None:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="CBOR no está disponible en este servidor"
+                )
+            return cbor2.loads(raw)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cuerpo de la solicitud inválido"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"Content-Type no soportado: {media_type}"
+    )
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"El cuerpo supera el máximo de {max_bytes} bytes"
+    )
+
+
+async def read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """
+    Lee el cuerpo cortando en `max_bytes`: rechaza por Content-Length antes de
+    leer nada y, si no viene (chunked), al pasarse mientras llega.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > max_bytes:
+        raise _too_large(max_bytes)
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise _too_large(max_bytes)
+    return bytes(body)
+
+
+def negotiated_body(schema: Union[Type[BaseModel], TypeAdapter], max_bytes: Optional[int] = None):
+    """
+    Dependencia que valida el cuerpo contra `schema` (un modelo o un
+    TypeAdapter) aceptando JSON, MessagePack o CBOR según el Content-Type.
+    Los errores de validación son los mismos que genera FastAPI (422).
+    Con `max_bytes`, los cuerpos más grandes se rechazan con 413 sin leerlos.
+    """
+    if isinstance(schema, TypeAdapter):
+        validate_json, validate_python = schema.validate_json, schema.validate_python
+    else:
+        validate_json, validate_python = schema.model_validate_json, schema.model_validate
+
+    async def dependency(request: Request):
+        if max_bytes is None:
+            raw = await request.body()
+        else:
+            raw = await read_limited_body(request, max_bytes)
+        media_type = _media_type(request.headers.get("content-type"))
+
+        try:
+            if media_type is None or media_type.endswith("json"):
+                payload = validate_json(raw)
+            else:
+                payload = validate_python(decode_payload(raw, media_type))
+        except ValidationError as e:
+            errors = []
+            for error in e.errors(include_url=False):
+                error["loc"] = ("body", *error["loc"])
+                errors.append(error)
+            raise RequestValidationError(errors)
+        # Para la captura de tráfico: cuenta registros sin volver a decodificar
+        request.state.payload = payload
+        return payload
+
+    return dependency
+
+
+def _inline_refs(schema: Any, defs: dict) -> Any:
+    """Reemplaza los $ref a $defs por la definición (los modelos no son recursivos)"""
+    if isinstance(schema, dict):
+        ref = schema.get("$ref")
+        if ref and ref.startswith("#/$defs/"):
+            return _inline_refs(defs[ref[len("#/$defs/"):]], defs)
+        return {key: _inline_refs(value, defs) for key, value in schema.items() if key != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(item, defs) for item in schema]
+    return schema
+
+
+def body_openapi(schema: Union[Type[BaseModel], TypeAdapter], binary_types: tuple = ()) -> dict:
+    """
+    `openapi_extra` con el requestBody de una ruta que usa negotiated_body:
+    como la dependencia lee el Request crudo, FastAPI no lo documenta solo.
+    `binary_types` agrega otros Content-Type aceptados sin esquema (ej. Parquet).
+    """
+    if isinstance(schema, TypeAdapter):
+        json_schema = schema.json_schema()
+    else:
+        json_schema = schema.model_json_schema()
+    json_schema = _inline_refs(json_schema, json_schema.get("$defs", {}))
+
+    media_types = [JSON, MSGPACK] + ([CBOR] if cbor2 is not None else [])
+    content = {media: {"schema": json_schema} for media in media_types}
+    for media in binary_types:
+        content[media] = {"schema": {"type": "string", "format": "binary"}}
+    return {"requestBody": {"required": True, "content": content}}
+
+
+def encode_content(content: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+    if media_type == CBOR:
+        return cbor2.dumps(content, default=_cbor_default)
+    raise ValueError(f"Formato no soportado: {media_type}")
+
+
+def negotiated_response(request: Request, content: Any, headers: Optional[dict] = None):
+    """
+    Devuelve `content` en MessagePack/CBOR si el header Accept lo pide.
+    Si no, devuelve el dict tal cual para que FastAPI lo serialice a JSON.
+    """
+    media_type = _accepted_binary_type(request.headers.get("accept"))
+    if media_type is None:
+        if headers:
+            return JSONResponse(content=jsonable_encoder(content), headers=headers)
+        return content
+
+    return Response(
+        content=encode_content(content, media_type),
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def serialize_document(doc: dict, iso_dates: bool = False) -> dict:
+    """
+    Adapta un documento de Mongo para la respuesta: `_id` -> `id`,
+    `user_id` a string y, opcionalmente, fechas a ISO.
+    """
+    if "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    if "user_id" in doc:
+        doc["user_id"] = str(doc["user_id"])
+    if iso_dates:
+        for field in ("created_at", "updated_at"):
+            if isinstance(doc.get(field), datetime):
+                doc[field] = doc[field].isoformat()
+    return doc
@@ -0,0 +1,90 @@
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from app.config import settings
+
+
+def _compile_glob(pattern: str) -> "re.Pattern":
+    """Convierte un urlPattern estilo glob (`*` = cualquier cosa) en regex"""
+    return re.compile(".*".join(re.escape(part) for part in pattern.split("*")), re.IGNORECASE)
+
+
+def _pattern_host(pattern: str) -> Optional[str]:
+    if "://" not in pattern:
+        return None
+    netloc = pattern.split("://", 1)[1].split("/", 1)[0]
+    host = netloc.rsplit("@", 1)[-1].split(":", 1)[0].lower()
+    return host or None
+
+
+class SiteMatcher:
+    """
+    Índice de los config_sites de un usuario por host.
+
+    - Hosts exactos (`hb.redlink.com.ar`) se indexan en un dict.
+    - Subdominios comodín (`*.redlink.com.ar`) se indexan por sufijo.
+    - Cualquier otro patrón queda en una lista genérica.
+    Una búsqueda sólo evalúa los patrones candidatos para el host.
+    """
+
+    def __init__(self, sites: List[dict]):
+        self._exact: Dict[str, List[Tuple["re.Pattern", dict]]] = {}
+        self._suffix: Dict[str, List[Tuple["re.Pattern", dict]]] = {}
+        self._generic: List[Tuple["re.Pattern", dict]] = []
+
+        for site in sites:
+            pattern = site.get("urlPattern")
+            if not pattern:
+                continue
+            entry = (_compile_glob(pattern), site)
+            host = _pattern_host(pattern)
+
+            if host and "*" not in host:
+                self._exact.setdefault(host, []).append(entry)
+            elif host and host.startswith("*.") and "*" not in host[2:]:
+                self._suffix.setdefault(host[2:], []).append(entry)
+            else:
+                self._generic.append(entry)
+
+    def _candidates(self, host: str):
+        yield from self._exact.get(host, ())
+        labels = host.split(".")
+        for i in range(1, len(labels)):
+            yield from self._suffix.get(".".join(labels[i:]), ())
+        yield from self._generic
+
+    def match(self, url: str) -> List[dict]:
+        host = (urlsplit(url).hostname or "").lower()
+        return [site for regex, site in self._candidates(host) if regex.fullmatch(url)]
+
+
+# Cache LRU en memoria: user_id -> (generación de config, vencimiento, SiteMatcher).
+# La generación viene del usuario autenticado, así que un índice armado antes
+# de una escritura hecha en otro worker deja de usarse en cuanto cambia
+_matchers: "OrderedDict[str, Tuple[int, float, SiteMatcher]]" = OrderedDict()
+
+
+def get_cached_matcher(user_id, generation: int) -> Optional[SiteMatcher]:
+    key = str(user_id)
+    entry = _matchers.get(key)
+    if entry is None or entry[0] != generation or entry[1] <= time.monotonic():
+        return None
+    _matchers.move_to_end(key)
+    return entry[2]
+
+
+def cache_matcher(user_id, sites: List[dict], generation: int) -> SiteMatcher:
+    key = str(user_id)
+    matcher = SiteMatcher(sites)
+    _matchers[key] = (generation, time.monotonic() + settings.CONFIG_CACHE_TTL_SECONDS, matcher)
+    _matchers.move_to_end(key)
+    while len(_matchers) > settings.SITE_MATCHER_CACHE_SIZE:
+        _matchers.popitem(last=False)
+    return matcher
+
+
+def invalidate_site_matcher(user_id):
+    """Libera el índice del usuario en este worker (la generación ya lo invalida)"""
+    _matchers.pop(str(user_id), None)
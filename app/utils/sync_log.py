@@ -0,0 +1,89 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from app.config import settings
+from app.database import get_database
+
+# Ring buffer en memoria: si se llena se descartan los eventos más viejos,
+# nunca se bloquea al request
+_buffer: deque = deque(maxlen=settings.SYNC_LOG_BUFFER_SIZE)
+_dropped = 0
+_wakeup: Optional[asyncio.Event] = None
+_stopping = False
+_task: Optional[asyncio.Task] = None
+
+
+def log_sync_event(user_id, action: str, records_affected: int, success: bool = True, **details):
+    """Encola un evento para sync_logs. No hace I/O."""
+    global _dropped
+    if len(_buffer) == _buffer.maxlen:
+        _dropped += 1
+
+    event = {
+        "user_id": user_id,
+        "timestamp": datetime.utcnow(),
+        "action": action,
+        "records_affected": records_affected,
+        "success": success
+    }
+    if details:
+        event["details"] = details
+    _buffer.append(event)
+
+    if _wakeup is not None and len(_buffer) >= settings.SYNC_LOG_BATCH_SIZE:
+        _wakeup.set()
+
+
+async def flush_sync_logs():
+    global _dropped
+    db = get_database()
+    if db is None:
+        return
+
+    if _dropped:
+        print(f"⚠️ sync_logs buffer full, {_dropped} events dropped")
+        _dropped = 0
+
+    while _buffer:
+        batch = []
+        while _buffer and len(batch) < settings.SYNC_LOG_BATCH_SIZE:
+            batch.append(_buffer.popleft())
+        try:
+            await db.sync_logs.insert_many(batch, ordered=False)
+        except Exception as e:
+            print(f"❌ Failed to write {len(batch)} sync_logs events: {e}")
+        except BaseException:
+            # Cancelado durante la escritura: devolver el lote al buffer
+            _buffer.extendleft(reversed(batch))
+            raise
+
+
+async def _flusher():
+    while not _stopping:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=settings.SYNC_LOG_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await flush_sync_logs()
+
+
+def start_sync_log_flusher():
+    global _wakeup, _stopping, _task
+    if _task is None:
+        _wakeup = asyncio.Event()
+        _stopping = False
+        _task = asyncio.create_task(_flusher())
+
+
+async def stop_sync_log_flusher():
+    global _stopping, _task
+    if _task is not None:
+        # Sin cancel(): se deja terminar el flush en curso
+        _stopping = True
+        _wakeup.set()
+        await _task
+        _task = None
+    # Escribir lo que quede antes de cerrar la conexión
+    await flush_sync_logs()
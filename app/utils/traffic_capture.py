@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+import msgpack
+from pydantic import BaseModel
+from app.config import settings
+from app.utils.serialization import decode_payload
+
+# Parámetros de query cuyo valor se guarda tal cual (no son datos del usuario)
+_KEPT_PARAMS = {"format", "series", "mode", "limit", "offset"}
+# Parámetros con timestamps: se guarda la antigüedad (ahora - valor), no la fecha
+_AGE_PARAMS = {"since", "ts", "dateFrom", "dateTo"}
+# Parámetros de path que se guardan tal cual; el resto son ids y se hashean
+KEPT_PATH_PARAMS = {"index"}
+# Parámetros de path con ids y el tipo de registro al que apuntan
+ID_PARAMS = {"investment_id": "investment", "site_id": "site", "upload_id": "upload"}
+# Rutas que crean esos registros: (método, ruta) -> (tipo, campo de "data" con el id)
+CREATE_ROUTES = {
+    ("POST", "/api/investments/"): ("investment", "id"),
+    ("POST", "/api/config/sites"): ("site", "id"),
+    ("POST", "/api/user/sites"): ("site", "id"),
+    ("POST", "/api/sync/uploads"): ("upload", "uploadId"),
+    ("POST", "/api/uploads"): ("upload", "uploadId"),
+}
+
+_buffer: deque = deque(maxlen=10000)
+_task: Optional[asyncio.Task] = None
+
+
+def client_slot(authorization: Optional[str]) -> Optional[str]:
+    """Identificador anónimo del cliente: hash corto del token, nunca el token"""
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()[:8]
+
+
+def id_token(value: str) -> str:
+    """Hash corto de un id: permite relacionar requests sin guardar el id"""
+    return hashlib.sha256(value.encode()).hexdigest()[:12]
+
+
+def path_shape(path_params: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        name: str(value) if name in KEPT_PATH_PARAMS else id_token(str(value))
+        for name, value in path_params.items()
+    }
+
+
+def created_token(body: bytes, field: str) -> Optional[str]:
+    """Hash del id que devolvió una ruta de CREATE_ROUTES (respuesta JSON chica)"""
+    try:
+        created = json.loads(body)["data"][field]
+    except Exception:
+        return None
+    return id_token(str(created)) if created else None
+
+
+def query_shape(query_params) -> Dict[str, Any]:
+    now_ms = time.time() * 1000
+    shape = {}
+    for name, value in query_params.items():
+        if name in _KEPT_PARAMS:
+            shape[name] = value
+        elif name in _AGE_PARAMS and value.lstrip("-").isdigit():
+            shape[name] = {"age": int(now_ms - int(value))}
+        else:
+            shape[name] = None  # sólo el nombre
+    return shape
+
+
+def list_lengths(value, prefix: str = "", depth: int = 0) -> Dict[str, int]:
+    """
+    Cantidad de elementos de cada lista de un cuerpo ya decodificado
+    (ej. {"investments": 500}). Los valores no se guardan.
+    """
+    counts = {}
+    if isinstance(value, BaseModel):
+        value = dict(value)
+    if isinstance(value, dict) and depth < 2:
+        for key, item in value.items():
+            if isinstance(item, list):
+                counts[prefix + key] = len(item)
+            elif isinstance(item, (dict, BaseModel)):
+                counts.update(list_lengths(item, f"{prefix}{key}.", depth + 1))
+    return counts
+
+
+def payload_counts(body: bytes, content_type: Optional[str]) -> Dict[str, int]:
+    """list_lengths de un cuerpo crudo: decodifica, así que sólo para cuerpos chicos"""
+    if not body:
+        return {}
+    media_type = (content_type or "application/json").split(";", 1)[0].strip().lower()
+    try:
+        if media_type.endswith("json"):
+            payload = json.loads(body)
+        else:
+            payload = decode_payload(body, media_type)
+    except Exception:
+        return {}
+    return list_lengths(payload)
+
+
+def sampled() -> bool:
+    return settings.CAPTURE_SAMPLE_RATE >= 1 or random.random() < settings.CAPTURE_SAMPLE_RATE
+
+
+def record_request(entry: dict):
+    """Encola una entrada de captura. No hace I/O."""
+    _buffer.append(entry)
+
+
+def flush_capture():
+    if not _buffer:
+        return
+    packer = msgpack.Packer(use_bin_type=True)
+    chunk = bytearray()
+    while _buffer:
+        chunk += packer.pack(_buffer.popleft())
+    # Varios workers pueden escribir al mismo archivo: un append por flush
+    with open(settings.CAPTURE_PATH, "ab") as f:
+        f.write(chunk)
+
+
+def read_capture(path: str) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        yield from msgpack.Unpacker(f, raw=False)
+
+
+async def _flusher():
+    while True:
+        await asyncio.sleep(1)
+        try:
+            flush_capture()
+        except OSError as e:
+            print(f"❌ Failed to write traffic capture: {e}")
+
+
+def start_traffic_capture():
+    global _task
+    if settings.CAPTURE_ENABLED and _task is None:
+        print(f"📼 Capturing traffic to {os.path.abspath(settings.CAPTURE_PATH)}")
+        _task = asyncio.create_task(_flusher())
+
+
+async def stop_traffic_capture():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    flush_capture()
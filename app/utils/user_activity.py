@@ -0,0 +1,75 @@
+import asyncio
+from typing import Dict, Optional
+from pymongo import UpdateOne
+from app.config import settings
+from app.database import get_database
+
+# user_id -> campos pendientes ($set). Escrituras repetidas del mismo usuario
+# se combinan y sólo se escribe el último valor
+_pending: Dict[object, dict] = {}
+_stop: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+
+_BATCH_SIZE = 1000
+
+
+def record_user_activity(user_id, **fields):
+    """Registra campos no críticos del usuario (ej. last_login) sin I/O"""
+    _pending.setdefault(user_id, {}).update(fields)
+
+
+def _requeue(chunk):
+    # Sin pisar valores más nuevos
+    for user_id, fields in chunk:
+        _pending[user_id] = {**fields, **_pending.get(user_id, {})}
+
+
+async def flush_user_activity():
+    global _pending
+    db = get_database()
+    if db is None or not _pending:
+        return
+
+    batch, _pending = _pending, {}
+    items = list(batch.items())
+
+    for i in range(0, len(items), _BATCH_SIZE):
+        chunk = items[i:i + _BATCH_SIZE]
+        try:
+            await db.users.bulk_write(
+                [UpdateOne({"_id": user_id}, {"$set": fields}) for user_id, fields in chunk],
+                ordered=False
+            )
+        except Exception as e:
+            print(f"❌ Failed to flush activity for {len(chunk)} users: {e}")
+            _requeue(chunk)
+        except BaseException:
+            # Cancelado: reencolar este chunk y los que faltaban
+            _requeue(items[i:])
+            raise
+
+
+async def _flusher():
+    while not _stop.is_set():
+        try:
+            await asyncio.wait_for(_stop.wait(), timeout=settings.USER_ACTIVITY_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        await flush_user_activity()
+
+
+def start_user_activity_flusher():
+    global _stop, _task
+    if _task is None:
+        _stop = asyncio.Event()
+        _task = asyncio.create_task(_flusher())
+
+
+async def stop_user_activity_flusher():
+    global _task
+    if _task is not None:
+        # Sin cancel(): se deja terminar el flush en curso
+        _stop.set()
+        await _task
+        _task = None
+    await flush_user_activity()
@@ -0,0 +1,218 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.database import get_database
+from app.utils.metrics import increment
+from app.utils.fx_rates import valuations
+from app.utils.investment_writes import CONTENT_FIELDS, CREATED, UPDATED, UNCHANGED, key_filter, upsert_investment
+
+
+LOOKUP_PROJECTION = {"user_id": 1, "timestamp": 1, "entidad": 1, **dict.fromkeys(CONTENT_FIELDS, 1)}
+
+
+def lookup_query(keys: List[tuple]) -> dict:
+    """Estado actual de todas las claves de un lote en una sola consulta"""
+    return {"$or": [key_filter(*key) for key in keys]}
+
+
+class _Write:
+    __slots__ = ("user_id", "record", "future")
+
+    def __init__(self, user_id, record: dict, future: asyncio.Future):
+        self.user_id = user_id
+        self.record = record
+        self.future = future
+
+    @property
+    def key(self) -> tuple:
+        return (self.user_id, self.record["timestamp"], self.record["entidad"])
+
+
+# Escrituras de requests concurrentes esperando el próximo flush
+_queue: List[_Write] = []
+_timer: Optional[asyncio.Task] = None
+_flushes: set = set()
+# Último flush en curso de cada clave: el siguiente lote con esa clave lo
+# espera, así las escrituras de una misma clave se aplican en orden
+_inflight: Dict[tuple, asyncio.Task] = {}
+
+
+async def submit_investment(user_id, record: dict) -> Tuple[str, object]:
+    """
+    Igual que upsert_investment, pero agrupa las escrituras de requests
+    concurrentes durante WRITE_BATCH_WINDOW_MS (o hasta WRITE_BATCH_MAX_RECORDS)
+    y las resuelve con un find y un bulk_write por lote.
+    Devuelve (CREATED | UPDATED | UNCHANGED, _id).
+    """
+    global _timer
+    if settings.WRITE_BATCH_WINDOW_MS <= 0:
+        return await upsert_investment(get_database(), user_id, record)
+
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(_consume_exception)
+    _queue.append(_Write(user_id, record, future))
+
+    if len(_queue) >= settings.WRITE_BATCH_MAX_RECORDS:
+        _start_flush()
+    elif _timer is None:
+        _timer = asyncio.create_task(_flush_after_window())
+
+    # shield: si el cliente se desconecta la escritura igual se completa
+    return await asyncio.shield(future)
+
+
+async def _flush_after_window():
+    global _timer
+    try:
+        await asyncio.sleep(settings.WRITE_BATCH_WINDOW_MS / 1000)
+    finally:
+        if _timer is asyncio.current_task():
+            _timer = None
+    _start_flush()
+
+
+def _consume_exception(future: asyncio.Future):
+    # Si el request se canceló nadie lee el error del future protegido por
+    # shield: leerlo acá evita el "Future exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+def _start_flush():
+    global _queue, _timer
+    if _timer is not None and _timer is not asyncio.current_task():
+        _timer.cancel()
+        _timer = None
+    if not _queue:
+        return
+    batch, _queue = _queue, []
+    keys = {write.key for write in batch}
+    previous = {_inflight[key] for key in keys if key in _inflight}
+    task = asyncio.create_task(_flush(batch, previous))
+    for key in keys:
+        _inflight[key] = task
+    _flushes.add(task)
+    task.add_done_callback(lambda done: _flush_done(done, keys))
+
+
+def _flush_done(task: asyncio.Task, keys: set):
+    _flushes.discard(task)
+    for key in keys:
+        if _inflight.get(key) is task:
+            del _inflight[key]
+
+
+def _resolve(write: _Write, result=None, error: Optional[BaseException] = None):
+    if write.future.done():
+        return
+    if error is not None:
+        write.future.set_exception(error)
+    else:
+        write.future.set_result(result)
+
+
+async def _flush(batch: List[_Write], previous: set):
+    if previous:
+        # Lotes anteriores con alguna de estas claves todavía escribiendo
+        await asyncio.wait(previous)
+    try:
+        await _apply(get_database(), batch)
+    except Exception as e:
+        print(f"❌ Failed to flush {len(batch)} investment writes: {e}")
+        for write in batch:
+            _resolve(write, error=e)
+
+
+async def _apply(db, batch: List[_Write]):
+    keys = list(dict.fromkeys(write.key for write in batch))
+    cursor = db.investments.find(lookup_query(keys), projection=LOOKUP_PROJECTION)
+    current: Dict[tuple, dict] = {
+        (doc["user_id"], doc["timestamp"], doc["entidad"]): doc
+        async for doc in cursor
+    }
+
+    # Aplicar las escrituras en orden de llegada; la misma clave repetida en
+    # el lote se combina en una sola operación con el último valor
+    outcomes: List[str] = []
+    changed: Dict[tuple, dict] = {}
+    now = datetime.utcnow()
+    for write in batch:
+        state = current.get(write.key)
+        content = {field: write.record.get(field) for field in CONTENT_FIELDS}
+
+        if state is None:
+            outcomes.append(CREATED)
+            current[write.key] = {**content, "_id": None}
+            changed[write.key] = write.record
+        elif any(state.get(field) != value for field, value in content.items()):
+            outcomes.append(UPDATED)
+            state.update(content)
+            changed[write.key] = write.record
+        else:
+            outcomes.append(UNCHANGED)
+
+    ops = []
+    op_keys = []
+    for key, record in changed.items():
+        existing_id = current[key]["_id"]
+        fields = {field: value for field, value in record.items() if field not in ("timestamp", "entidad")}
+        fields.update(valuations(record))
+        fields["updated_at"] = now
+        if existing_id is None:
+            # Upsert: si otro writer lo insertó entre el find y el flush no falla
+            ops.append(UpdateOne(
+                key_filter(*key),
+                {"$set": fields, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            ))
+        else:
+            ops.append(UpdateOne({"_id": existing_id}, {"$set": fields}))
+        op_keys.append(key)
+
+    failed: Dict[tuple, BaseException] = {}
+    upserted: Dict[int, object] = {}
+    if ops:
+        try:
+            result = await db.investments.bulk_write(ops, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                failed[op_keys[error["index"]]] = e
+        increment("investment_write_batches")
+
+    for index, key in enumerate(op_keys):
+        if index in upserted:
+            current[key]["_id"] = upserted[index]
+
+    # Upserts que terminaron actualizando un registro insertado por otro writer
+    # entre el find y el bulk_write: no los creó este lote
+    missing = [key for key in op_keys if current[key]["_id"] is None and key not in failed]
+    outcomes = [
+        UPDATED if outcome == CREATED and write.key in missing else outcome
+        for write, outcome in zip(batch, outcomes)
+    ]
+    for key in missing:
+        doc = await db.investments.find_one(key_filter(*key), projection={"_id": 1})
+        current[key]["_id"] = doc["_id"] if doc else None
+
+    for write, outcome in zip(batch, outcomes):
+        if write.key in failed:
+            _resolve(write, error=failed[write.key])
+            continue
+        increment({
+            CREATED: "investment_writes_created",
+            UPDATED: "investment_writes_updated",
+            UNCHANGED: "investment_writes_skipped"
+        }[outcome])
+        _resolve(write, (outcome, current[write.key]["_id"]))
+
+
+async def stop_write_batcher():
+    """Vacía la cola pendiente y espera los flushes en curso"""
+    _start_flush()
+    if _flushes:
+        await asyncio.gather(*_flushes, return_exceptions=True)
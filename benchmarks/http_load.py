@@ -0,0 +1,76 @@
+"""
+Generador de carga HTTP simple para comparar configuraciones del servidor.
+
+Uso:
+    # Un worker
+    WEB_CONCURRENCY=1 python serve.py
+    python -m benchmarks.http_load --url http://localhost:8000/api/sync/status --token TOKEN
+
+    # N workers (0 = uno por CPU)
+    WEB_CONCURRENCY=4 python serve.py
+    python -m benchmarks.http_load --url http://localhost:8000/api/sync/status --token TOKEN
+
+Resultados de referencia en el README (sección de producción). Correr el
+generador en otra máquina: si comparte CPUs con el servidor, mide al cliente.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, url: str, headers: dict, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url, headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    latencies: list = []
+    errors: list = []
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*[
+            worker(client, args.url, headers, deadline, latencies, errors)
+            for _ in range(args.concurrency)
+        ])
+
+    print(f"{len(latencies)} requests en {args.duration}s ({len(latencies) / args.duration:.1f} req/s), {len(errors)} errores")
+    if latencies:
+        print(
+            f"p50 {percentile(latencies, 0.50):.1f} ms | "
+            f"p95 {percentile(latencies, 0.95):.1f} ms | "
+            f"p99 {percentile(latencies, 0.99):.1f} ms | "
+            f"media {statistics.mean(latencies):.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000/health")
+    parser.add_argument("--token", default=None)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark del parseo de payloads bulk: modelos Pydantic por fila vs TypeAdapter.
+
+Uso:
+    python -m benchmarks.parse_bulk [--rows 10000] [--repeat 20]
+"""
+import argparse
+import json
+
+from app.models.investment import BulkInvestmentRequest, bulk_investment_adapter, with_defaults
+from benchmarks.serialization import build_payload, timeit
+
+
+def parse_models(raw: bytes) -> list:
+    # Camino anterior: un InvestmentCreate por fila y model_dump() en el handler
+    request = BulkInvestmentRequest.model_validate_json(raw)
+    return [record.model_dump() for record in request.records]
+
+
+def parse_adapter(raw: bytes) -> list:
+    return with_defaults(bulk_investment_adapter.validate_json(raw)["records"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = json.dumps(build_payload(args.rows)).encode()
+    assert parse_models(raw) == parse_adapter(raw)
+
+    models_ms = timeit(lambda: parse_models(raw), args.repeat)
+    adapter_ms = timeit(lambda: parse_adapter(raw), args.repeat)
+
+    print(f"{args.rows} filas, mejor de {args.repeat} corridas")
+    print(f"modelos + model_dump: {models_ms:.2f} ms ({args.rows / models_ms * 1000:,.0f} filas/s)")
+    print(f"TypeAdapter (dicts):  {adapter_ms:.2f} ms ({args.rows / adapter_ms * 1000:,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
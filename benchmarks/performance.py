@@ -0,0 +1,114 @@
+"""
+Benchmark de GET /api/investments/performance sin el servidor de Mongo:
+decodificar la respuesta BSON a arrays y calcular las métricas. Compara un
+documento por fila (find + cursor) con los documentos agrupados por entidad
+y ventana que devuelve la aggregation de load_columns.
+
+Uso:
+    python -m benchmarks.performance [--rows 100000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import random
+
+import bson
+import numpy as np
+
+from app.utils.performance import GROUP_WINDOW_MS, columns_from_groups, compute_performance
+from benchmarks.serialization import ENTIDADES, timeit
+
+BATCH_SIZE = 10000
+
+
+def build_rows(rows: int) -> list:
+    base = 1704067200000
+    return [
+        {
+            "timestamp": base + i * 3600000,
+            "entidad": random.choice(ENTIDADES),
+            "monto_ars": round(random.uniform(1000, 5000000), 2),
+            "monto_usd": round(random.uniform(10, 50000), 2) if i % 3 else None
+        }
+        for i in range(rows)
+    ]
+
+
+def row_batches(rows: list) -> list:
+    """Batches BSON de un documento por fila, como los de un cursor find()"""
+    return [
+        b"".join(bson.encode(row) for row in rows[start:start + BATCH_SIZE])
+        for start in range(0, len(rows), BATCH_SIZE)
+    ]
+
+
+def grouped_documents(rows: list) -> list:
+    """Documentos BSON como los que devuelve la aggregation de load_columns"""
+    groups = {}
+    for row in rows:
+        key = (row["entidad"], row["timestamp"] // GROUP_WINDOW_MS)
+        group = groups.setdefault(key, {
+            "_id": {"entidad": key[0], "window": key[1]},
+            "timestamp": [], "monto_ars": [], "monto_usd": []
+        })
+        for field in ("timestamp", "monto_ars", "monto_usd"):
+            group[field].append(row[field])
+    return [bson.encode(group) for group in groups.values()]
+
+
+async def _documents(batches: list):
+    for raw in batches:
+        for doc in bson.decode_all(raw):
+            yield doc
+
+
+def columns_per_document(batches: list) -> dict:
+    # Camino anterior: async for sobre el cursor y listas de Python
+    async def run():
+        codes = {}
+        timestamps, entidades, ars, usd = [], [], [], []
+        async for doc in _documents(batches):
+            timestamps.append(doc["timestamp"])
+            entidades.append(codes.setdefault(doc["entidad"], len(codes)))
+            ars.append(doc.get("monto_ars"))
+            usd.append(doc.get("monto_usd"))
+        return {
+            "names": list(codes),
+            "timestamp": np.asarray(timestamps, dtype=np.int64),
+            "entidad": np.asarray(entidades, dtype=np.int32),
+            "monto_ars": np.asarray(ars, dtype=np.float64),
+            "monto_usd": np.asarray(usd, dtype=np.float64)
+        }
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    batches = row_batches(rows)
+    grouped = grouped_documents(rows)
+
+    def columns_grouped():
+        return columns_from_groups([bson.decode(raw) for raw in grouped])
+
+    columns = columns_grouped()
+    expected = columns_per_document(batches)
+    assert all(np.array_equal(columns[k], expected[k], equal_nan=True) for k in ("timestamp", "monto_ars", "monto_usd"))
+
+    per_document_ms = timeit(lambda: columns_per_document(batches), args.repeat)
+    grouped_ms = timeit(columns_grouped, args.repeat)
+    compute_ms = timeit(lambda: compute_performance(columns, include_series=True), args.repeat)
+
+    print(f"{args.rows} filas, {len(ENTIDADES)} entidades, mejor de {args.repeat} corridas")
+    print(f"BSON -> arrays, un documento por fila: {per_document_ms:.2f} ms")
+    print(f"BSON -> arrays, agrupado ({len(grouped)} docs):  {grouped_ms:.2f} ms")
+    print(f"métricas (series=true):                {compute_ms:.2f} ms")
+    print(f"total sin Mongo:                       {grouped_ms + compute_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark JSON vs MessagePack vs CBOR para payloads de sincronización.
+
+Uso:
+    python -m benchmarks.serialization [--rows 10000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+
+import msgpack
+
+from app.models.investment import bulk_investment_adapter
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+ENTIDADES = ["Banco Nación", "Banco Galicia", "Mercado Pago", "IOL", "Binance", "Plazo Fijo"]
+
+
+def build_payload(rows: int) -> dict:
+    base = 1704067200000
+    records = []
+    for i in range(rows):
+        records.append({
+            "timestamp": base + i * 3600000,
+            "entidad": random.choice(ENTIDADES),
+            "monto_ars": round(random.uniform(1000, 5000000), 2),
+            "monto_usd": round(random.uniform(10, 50000), 2) if i % 3 else None
+        })
+    return {"records": records}
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_payload(args.rows)
+
+    formats = {
+        "json": (
+            lambda: json.dumps(payload).encode(),
+            lambda raw: bulk_investment_adapter.validate_json(raw)
+        ),
+        "msgpack": (
+            lambda: msgpack.packb(payload, use_bin_type=True),
+            lambda raw: bulk_investment_adapter.validate_python(msgpack.unpackb(raw, raw=False))
+        )
+    }
+    if cbor2 is not None:
+        formats["cbor"] = (
+            lambda: cbor2.dumps(payload),
+            lambda raw: bulk_investment_adapter.validate_python(cbor2.loads(raw))
+        )
+
+    print(f"{args.rows} filas, mejor de {args.repeat} corridas")
+    print(f"{'formato':<10}{'bytes':>12}{'encode ms':>12}{'parse ms':>12}")
+    for name, (encode, parse) in formats.items():
+        raw = encode()
+        encode_ms = timeit(encode, args.repeat)
+        parse_ms = timeit(lambda: parse(raw), args.repeat)
+        print(f"{name:<10}{len(raw):>12}{encode_ms:>12.2f}{parse_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,45 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
 from app.database import connect_to_mongo, close_mongo_connection
-from app.routers import auth, investments, config, sync
+from app.routers import auth, investments, config, sync, batch, admin
+from app.utils.retention import start_retention_scheduler, stop_retention_scheduler
+from app.utils.sync_log import start_sync_log_flusher, stop_sync_log_flusher
+from app.utils.user_activity import start_user_activity_flusher, stop_user_activity_flusher
+from app.utils.config_cache import close_config_cache
+from app.utils.write_batcher import stop_write_batcher
+from app.utils.traffic_capture import start_traffic_capture, stop_traffic_capture
+from app.middleware.auth import get_metrics_reader
+from app.middleware.capture import TrafficCaptureMiddleware
+from app.middleware.slow_requests import SlowRequestMiddleware
+from app.utils.profiler import start_slow_request_profiler, stop_slow_request_profiler
+from app.utils.fx_rates import start_fx_rates, stop_fx_rates
+from app.utils import metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongo()
+    await start_fx_rates()
+    start_retention_scheduler()
+    start_sync_log_flusher()
+    start_user_activity_flusher()
+    start_traffic_capture()
+    start_slow_request_profiler()
     print("🚀 Investment Tracker API started")
     yield
     # Shutdown
+    await stop_write_batcher()
+    await stop_retention_scheduler()
+    await stop_sync_log_flusher()
+    await stop_user_activity_flusher()
+    await stop_traffic_capture()
+    await stop_slow_request_profiler()
+    await stop_fx_rates()
+    await close_config_cache()
     await close_mongo_connection()
     print("👋 Investment Tracker API stopped")
 
@@ -34,6 +60,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Captura de tráfico para scripts/replay_traffic.py (opt-in)
+if settings.CAPTURE_ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware)
+
+# Perfil + traza Mongo de los requests más lentos que SLOW_REQUEST_MS
+if settings.SLOW_REQUEST_MS > 0:
+    app.add_middleware(SlowRequestMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(investments.router, prefix="/api/investments", tags=["Investments"])
@@ -41,6 +75,8 @@ app.include_router(config.router, prefix="/api/config", tags=["Configuration"])
 app.include_router(config.router, prefix="/api/user", tags=["User"])
 app.include_router(sync.router, prefix="/api/sync", tags=["Synchronization"])
 app.include_router(sync.router, prefix="/api", tags=["Export/Import"])
+app.include_router(batch.router, prefix="/api/batch", tags=["Batch"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/", tags=["Root"])
@@ -59,3 +95,11 @@ async def health():
         "status": "OK",
         "environment": settings.ENVIRONMENT
     }
+
+
+@app.get("/metrics", tags=["Health"], dependencies=[Depends(get_metrics_reader)])
+async def get_metrics():
+    return {
+        "status": "OK",
+        "counters": metrics.snapshot()
+    }
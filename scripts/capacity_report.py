@@ -0,0 +1,241 @@
+"""
+Reporte de capacidad: tamaño de colecciones e índices y uso por usuario.
+
+Por usuario: documentos, bytes, entidades distintas, snapshots por día y
+crecimiento (snapshots con timestamp en los últimos --growth-days días) en
+investments, más documentos y bytes en config_sites.
+
+Las métricas de investments salen de consultas resueltas con los índices
+(count, distinct y los extremos de (user_id, timestamp)), sin leer los
+documentos. Los bytes son exactos ($bsonSize) para usuarios de hasta
+--exact-bytes-max documentos; por encima se estiman con el avgObjSize de
+collStats. Los usuarios se leen de a --batch-size con una pausa de --pause
+después de cada uno, así que se puede correr contra el cluster productivo;
+--secondary lee de secundarios.
+
+Uso:
+    python -m scripts.capacity_report --output capacidad.json
+    python -m scripts.capacity_report --uri "$MONGODB_URI" --format csv --output usuarios.csv --top 20
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+
+DB_NAME = "investment-tracker"
+DAY_MS = 86400000
+COLLECTIONS = ("investments", "config_sites", "users", "sync_logs", "upload_sessions")
+
+CSV_FIELDS = [
+    "user_id", "email", "investments", "investmentBytes", "investmentBytesEstimated", "entidades", "firstTimestamp",
+    "lastTimestamp", "snapshotsPerDay", "recentInvestments", "growthPerDay",
+    "configSites", "configSiteBytes", "indexBytesEstimate"
+]
+
+
+async def collection_stats(db) -> dict:
+    existing = set(await db.list_collection_names())
+    stats = {}
+    for name in COLLECTIONS:
+        if name not in existing:
+            continue
+        raw = await db.command("collStats", name)
+        stats[name] = {
+            "count": raw.get("count", 0),
+            "size": raw.get("size", 0),
+            "avgObjSize": raw.get("avgObjSize", 0),
+            "storageSize": raw.get("storageSize", 0),
+            "totalIndexSize": raw.get("totalIndexSize", 0),
+            "indexSizes": raw.get("indexSizes", {})
+        }
+    return stats
+
+
+async def _edge_timestamp(db, user_id, direction: int):
+    doc = await db.investments.find_one(
+        {"user_id": user_id},
+        projection={"_id": 0, "timestamp": 1},
+        sort=[("timestamp", direction)]
+    )
+    return doc["timestamp"] if doc else None
+
+
+async def investment_usage(db, user_id, recent_since_ms: int, avg_obj_size: float, exact_bytes_max: int) -> dict:
+    count = await db.investments.count_documents({"user_id": user_id})
+    if not count:
+        return {}
+
+    usage = {
+        "investments": count,
+        "entidades": len(await db.investments.distinct("entidad", {"user_id": user_id})),
+        "firstTimestamp": await _edge_timestamp(db, user_id, 1),
+        "lastTimestamp": await _edge_timestamp(db, user_id, -1),
+        "recentInvestments": await db.investments.count_documents(
+            {"user_id": user_id, "timestamp": {"$gte": recent_since_ms}}
+        )
+    }
+
+    if count <= exact_bytes_max:
+        cursor = db.investments.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": None, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}}
+        ])
+        groups = await cursor.to_list(length=1)
+        usage["investmentBytes"] = groups[0]["bytes"] if groups else 0
+        usage["investmentBytesEstimated"] = False
+    else:
+        # Leer todos los documentos de un usuario grande sólo para medirlos es
+        # justo lo que el reporte no debe hacer: promedio de la colección
+        usage["investmentBytes"] = int(count * avg_obj_size)
+        usage["investmentBytesEstimated"] = True
+    return usage
+
+
+async def config_site_usage(db, user_ids: list) -> dict:
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$group": {
+            "_id": "$user_id",
+            "configSites": {"$sum": 1},
+            "configSiteBytes": {"$sum": {"$bsonSize": "$$ROOT"}}
+        }}
+    ]
+    cursor = db.config_sites.aggregate(pipeline, allowDiskUse=True)
+    return {doc.pop("_id"): doc async for doc in cursor}
+
+
+def user_row(user: dict, investments: dict, sites: dict, growth_days: int, index_bytes_per_doc: float) -> dict:
+    row = {
+        "user_id": str(user["_id"]),
+        "email": user.get("email"),
+        "investments": 0,
+        "investmentBytes": 0,
+        "investmentBytesEstimated": False,
+        "entidades": 0,
+        "firstTimestamp": None,
+        "lastTimestamp": None,
+        "recentInvestments": 0,
+        "configSites": 0,
+        "configSiteBytes": 0
+    }
+    row.update(investments)
+    row.update(sites)
+
+    span_days = 0
+    if row["firstTimestamp"] is not None:
+        span_days = (row["lastTimestamp"] - row["firstTimestamp"]) / DAY_MS
+    row["snapshotsPerDay"] = round(row["investments"] / span_days, 2) if span_days >= 1 else None
+    row["growthPerDay"] = round(row["recentInvestments"] / growth_days, 2)
+    # Parte proporcional de los índices de investments (estimación)
+    row["indexBytesEstimate"] = int(row["investments"] * index_bytes_per_doc)
+    return row
+
+
+async def run(args) -> int:
+    read_preference = "secondaryPreferred" if args.secondary else "primary"
+    client = AsyncIOMotorClient(args.uri, serverSelectionTimeoutMS=5000, readPreference=read_preference)
+    db = client[args.db]
+
+    try:
+        stats = await collection_stats(db)
+        investments_stats = stats.get("investments", {})
+        index_bytes_per_doc = (
+            investments_stats.get("totalIndexSize", 0) / investments_stats["count"]
+            if investments_stats.get("count") else 0
+        )
+
+        recent_since_ms = int(time.time() * 1000) - args.growth_days * DAY_MS
+        users = []
+        last_id = None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+            batch = await db.users.find(query, {"email": 1}).sort("_id", 1).limit(args.batch_size).to_list(length=None)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+            user_ids = [user["_id"] for user in batch]
+
+            sites = await config_site_usage(db, user_ids)
+            for user in batch:
+                investments = await investment_usage(
+                    db, user["_id"], recent_since_ms,
+                    investments_stats.get("avgObjSize", 0), args.exact_bytes_max
+                )
+                users.append(user_row(
+                    user,
+                    investments,
+                    sites.get(user["_id"], {}),
+                    args.growth_days,
+                    index_bytes_per_doc
+                ))
+                await asyncio.sleep(args.pause)
+
+            print(f"📊 {len(users)} usuarios procesados", file=sys.stderr)
+    finally:
+        client.close()
+
+    users.sort(key=lambda row: row["investmentBytes"], reverse=True)
+    report = {
+        "generatedAt": datetime.utcnow().isoformat(),
+        "growthDays": args.growth_days,
+        "collections": stats,
+        "users": users
+    }
+
+    if args.format == "csv":
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(users)
+        # Las estadísticas de colecciones no entran en el CSV por usuario
+        with open(args.output.rsplit(".", 1)[0] + ".collections.json", "w") as f:
+            json.dump(stats, f, indent=2)
+    else:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    print(f"\n{'colección':<18}{'docs':>12}{'datos MB':>11}{'índices MB':>12}")
+    for name, collection in stats.items():
+        print(
+            f"{name:<18}{collection['count']:>12}{collection['size'] / 2**20:>11.1f}"
+            f"{collection['totalIndexSize'] / 2**20:>12.1f}"
+        )
+
+    print(f"\nTop {args.top} usuarios por bytes en investments:")
+    print(f"{'user_id':<26}{'docs':>10}{'MB':>9}{'entidades':>11}{'snaps/día':>11}{'nuevos/día':>12}")
+    for row in users[:args.top]:
+        snapshots = row["snapshotsPerDay"] if row["snapshotsPerDay"] is not None else "-"
+        print(
+            f"{row['user_id']:<26}{row['investments']:>10}{row['investmentBytes'] / 2**20:>9.2f}"
+            f"{row['entidades']:>11}{snapshots:>11}{row['growthPerDay']:>12}"
+        )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=settings.MONGODB_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--output", default="capacity_report.json")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--batch-size", type=int, default=200, help="usuarios por página")
+    parser.add_argument("--pause", type=float, default=0.01, help="segundos entre usuarios")
+    parser.add_argument(
+        "--exact-bytes-max", type=int, default=5000,
+        help="hasta cuántos documentos por usuario se miden con $bsonSize; por encima se estima con collStats"
+    )
+    parser.add_argument("--growth-days", type=int, default=30)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--secondary", action="store_true", help="leer de secundarios si hay")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
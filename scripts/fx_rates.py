@@ -0,0 +1,86 @@
+"""
+Carga cotizaciones ARS/USD en fx_rates y recalcula valor_ars/valor_usd.
+
+El CSV tiene una fila por día: fecha (YYYY-MM-DD o timestamp en ms) y
+ARS por USD. Los workers recargan la tabla cada FX_RATES_REFRESH_MINUTES.
+
+Uso:
+    python -m scripts.fx_rates load cotizaciones.csv [--source bcra]
+    python -m scripts.fx_rates backfill [--batch-size 1000] [--pause 0.05]
+"""
+import argparse
+import asyncio
+import csv
+import sys
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.utils.fx_rates import backfill_valuations, load_fx_rates, store_fx_rates
+
+DB_NAME = "investment-tracker"
+
+
+def parse_date(value: str) -> int:
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    date = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def read_csv(path: str) -> list:
+    rows = []
+    with open(path, newline="") as f:
+        for line_number, row in enumerate(csv.reader(f), start=1):
+            if not row or row[0].startswith("#"):
+                continue
+            try:
+                rows.append((parse_date(row[0]), float(row[1].replace(",", "."))))
+            except (ValueError, IndexError):
+                if line_number == 1:
+                    continue  # encabezado
+                raise SystemExit(f"Línea {line_number} inválida: {row}")
+    return rows
+
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.uri, serverSelectionTimeoutMS=5000)
+    db = client[args.db]
+    try:
+        if args.command == "load":
+            rows = read_csv(args.file)
+            stored = await store_fx_rates(db, rows, source=args.source)
+            print(f"💱 {stored} cotizaciones guardadas")
+        else:
+            count = await load_fx_rates(db)
+            if not count:
+                print("⚠️ fx_rates está vacía: cargar cotizaciones antes del backfill")
+                return 1
+            report = await backfill_valuations(db, batch_size=args.batch_size, pause=args.pause)
+            print(f"💱 {report['updated']} de {report['scanned']} registros actualizados con {count} cotizaciones")
+    finally:
+        client.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=settings.MONGODB_URI)
+    parser.add_argument("--db", default=DB_NAME)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="cargar un CSV de cotizaciones diarias")
+    load.add_argument("file")
+    load.add_argument("--source", default="local")
+
+    backfill = commands.add_parser("backfill", help="recalcular valor_ars/valor_usd existentes")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    backfill.add_argument("--pause", type=float, default=0.05, help="segundos entre lotes")
+
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
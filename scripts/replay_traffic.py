@@ -0,0 +1,397 @@
+"""
+Reproduce una captura de tráfico (CAPTURE_ENABLED=true) contra la API.
+
+La captura sólo tiene la forma de cada request (ruta, cantidad de registros,
+tamaños y tiempos); los cuerpos se regeneran con datos sintéticos y cada
+cliente capturado se mapea a un usuario replay-<id>@example.com.
+Los datos sintéticos salen de --seed y de los tiempos de la captura: dos
+corridas de la misma captura mandan los mismos cuerpos.
+
+Los ids del path se capturan hasheados. Si el registro se creó durante la
+captura, se usa el id que devuelve ese mismo request en el replay; si ya
+existía, se crea uno equivalente antes de empezar. Cuerpos Parquet/Arrow y
+rutas con otros parámetros de path se omiten.
+
+Uso:
+    # Contra un servidor levantado
+    python -m scripts.replay_traffic traffic.capture --url http://localhost:8000 --speed 2
+
+    # En proceso, contra main.app (usa MONGODB_URI: apuntar a una base descartable)
+    python -m scripts.replay_traffic traffic.capture --in-process
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import count
+from typing import Optional
+
+import httpx
+
+from app.utils.serialization import CBOR, MSGPACK, encode_content
+from app.utils.traffic_capture import CREATE_ROUTES, ID_PARAMS, KEPT_PATH_PARAMS, read_capture
+
+PASSWORD = "replay-password"
+# Valores para parámetros de query cuyo valor no se captura
+SYNTHETIC_PARAMS = {"url": "https://site0.example.com/cuenta", "entity": "Entidad 0"}
+# Cómo crear los registros que ya existían al capturar: tipo -> ruta
+SEED_ROUTES = {kind: route for (_, route), (kind, _) in CREATE_ROUTES.items()}
+
+_PATH_PARAM = re.compile(r"\{(\w+)(?::\w+)?\}")
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+class SyntheticData:
+    """Cuerpos y parámetros sintéticos, deterministas para una misma semilla"""
+
+    def __init__(self, seed: int):
+        self.random = random.Random(seed)
+        self.sequence = count()
+        self.list_items = {
+            "investments": self.investment,
+            "records": self.investment,
+            "configSites": self.config_site,
+            "requests": self.sub_request,
+        }
+
+    def investment(self, at_ms: float) -> dict:
+        i = next(self.sequence)
+        return {
+            # Timestamps del momento capturado, distintos entre sí
+            "timestamp": int(at_ms) + i,
+            "entidad": f"Entidad {i % 8}",
+            "monto_ars": round(self.random.uniform(1000, 5000000), 2),
+            "monto_usd": round(self.random.uniform(10, 50000), 2) if self.random.random() < 0.3 else None
+        }
+
+    def config_site(self, at_ms: float) -> dict:
+        i = next(self.sequence)
+        return {
+            "name": f"Sitio {i}",
+            "urlPattern": f"https://site{i % 8}.example.com/*",
+            "selectors": {"ars": ".saldo"},
+            "investment": f"Entidad {i % 8}"
+        }
+
+    def sub_request(self, at_ms: float) -> dict:
+        return {"method": "GET", "path": "/api/sync/status"}
+
+    def login(self, slot: Optional[str]) -> dict:
+        slot = slot or f"anon{next(self.sequence)}"
+        return {"email": f"replay-{slot}@example.com", "password": PASSWORD}
+
+    def base_body(self, method: str, route: str, at_ms: float) -> Optional[dict]:
+        if method == "GET" or method == "DELETE":
+            return None
+        if route.endswith("/push"):
+            return {"clientTimestamp": datetime.utcfromtimestamp(at_ms / 1000).isoformat()}
+        if route.endswith("/import"):
+            return {"data": {}}
+        if route.endswith("/preferences"):
+            return {"theme": "dark"}
+        if route.endswith("/retention"):
+            return {"enabled": True}
+        if route.endswith("/uploads"):
+            return {"totalChunks": 1}
+        if route.endswith("/sites") or route.endswith("/sites/{site_id}"):
+            return self.config_site(at_ms)
+        if route == "/api/investments/":
+            return self.investment(at_ms)
+        if route == "/api/investments/{investment_id}":
+            return {"monto_ars": round(self.random.uniform(1000, 5000000), 2)}
+        return {}
+
+    def body(self, entry: dict) -> Optional[dict]:
+        body = self.base_body(entry["m"], entry["r"], entry["t"])
+        if body is None:
+            return None
+        for path, size in entry.get("n", {}).items():
+            *parents, field = path.split(".")
+            target = body
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            make = self.list_items.get(field)
+            target[field] = [make(entry["t"]) if make else {} for _ in range(size)]
+        return body
+
+    @staticmethod
+    def query(entry: dict) -> dict:
+        # Las fechas se reconstruyen relativas al momento capturado, igual
+        # que los timestamps de los registros sintéticos
+        params = {}
+        for name, value in entry.get("q", {}).items():
+            if isinstance(value, dict):
+                params[name] = int(entry["t"] - value["age"])
+            elif value is not None:
+                params[name] = value
+            elif name in SYNTHETIC_PARAMS:
+                params[name] = SYNTHETIC_PARAMS[name]
+        return params
+
+
+def id_keys(entry: dict) -> list:
+    """(cliente, tipo, hash) de cada id del path del request"""
+    return [
+        (entry.get("u"), ID_PARAMS[name], value)
+        for name, value in (entry.get("p") or {}).items()
+        if name in ID_PARAMS
+    ]
+
+
+def created_key(entry: dict) -> Optional[tuple]:
+    created = CREATE_ROUTES.get((entry["m"], entry.get("r")))
+    if created is None or not entry.get("c"):
+        return None
+    return (entry.get("u"), created[0], entry["c"])
+
+
+def replayable(entry: dict) -> bool:
+    route = entry.get("r")
+    if not route:
+        return False
+    if "{" in route:
+        # Capturas anteriores no guardaban los ids del path
+        names = set(_PATH_PARAM.findall(route))
+        params = entry.get("p")
+        if params is None or set(params) != names:
+            return False
+        if any(name not in ID_PARAMS and name not in KEPT_PATH_PARAMS for name in names):
+            return False
+    content_type = (entry.get("ct") or "").lower()
+    return "parquet" not in content_type and "arrow" not in content_type
+
+
+class Replayer:
+    def __init__(self, client: httpx.AsyncClient, seed: int = 0):
+        self.client = client
+        self.data = SyntheticData(seed)
+        self.tokens = {}
+        # (cliente, tipo, hash capturado) -> id real en esta corrida
+        self.ids = {}
+        # Chunks que recibió cada carga en la captura, para su totalChunks
+        self.upload_chunks = {}
+        self.unresolved = 0
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_mismatches = defaultdict(int)
+
+    async def login(self, slot: str) -> str:
+        credentials = self.data.login(slot)
+        response = await self.client.post("/api/auth/register", json=credentials)
+        if response.status_code != 200:
+            response = await self.client.post("/api/auth/login", json=credentials)
+        response.raise_for_status()
+        return response.json()["token"]
+
+    def _headers(self, slot: Optional[str]) -> dict:
+        if slot in self.tokens:
+            return {"Authorization": f"Bearer {self.tokens[slot]}"}
+        return {}
+
+    def _id_future(self, key: tuple) -> asyncio.Future:
+        if key not in self.ids:
+            self.ids[key] = asyncio.get_running_loop().create_future()
+        return self.ids[key]
+
+    def _set_id(self, key: tuple, real_id: Optional[str]):
+        future = self._id_future(key)
+        # Un POST /api/investments/ repetido devuelve el mismo id dos veces
+        if not future.done():
+            future.set_result(real_id)
+
+    async def seed_record(self, key: tuple, at_ms: float):
+        """Crea el equivalente de un registro que ya existía al capturar"""
+        slot, kind, _ = key
+        route = SEED_ROUTES[kind]
+        # Cargas sin totalChunks: aceptan cualquier índice de chunk capturado
+        body = {} if kind == "upload" else self.data.base_body("POST", route, at_ms)
+        response = await self.client.post(route, json=body, headers=self._headers(slot))
+        field = CREATE_ROUTES[("POST", route)][1]
+        self._set_id(key, response.json()["data"][field] if response.status_code == 200 else None)
+
+    async def setup(self, entries: list):
+        slots = {entry["u"] for entry in entries if entry.get("u")}
+        for slot in sorted(slots):
+            self.tokens[slot] = await self.login(slot)
+        print(f"🔑 {len(slots)} usuarios sintéticos")
+
+        created = {created_key(entry) for entry in entries}
+        seeds = {}
+        for entry in entries:
+            for key in id_keys(entry):
+                if key not in created:
+                    seeds.setdefault(key, entry["t"])
+            index = (entry.get("p") or {}).get("index", "")
+            if index.isdigit() and "upload_id" in entry["p"]:
+                key = (entry.get("u"), "upload", entry["p"]["upload_id"])
+                self.upload_chunks[key] = max(self.upload_chunks.get(key, 0), int(index) + 1)
+        for key, at_ms in seeds.items():
+            await self.seed_record(key, at_ms)
+        if seeds:
+            print(f"🌱 {len(seeds)} registros que existían antes de la captura")
+
+    async def path(self, entry: dict) -> Optional[str]:
+        """Ruta con los ids de esta corrida; None si alguno no se pudo crear"""
+        values = {}
+        for name, value in (entry.get("p") or {}).items():
+            if name in ID_PARAMS:
+                # Si el request que lo crea sigue en curso, se espera su respuesta
+                value = await self._id_future((entry.get("u"), ID_PARAMS[name], value))
+                if value is None:
+                    return None
+            values[name] = value
+        return _PATH_PARAM.sub(lambda match: str(values[match.group(1)]), entry["r"])
+
+    async def send(self, entry: dict):
+        method, route = entry["m"], entry["r"]
+        headers = self._headers(entry.get("u"))
+        if entry.get("ac"):
+            headers["Accept"] = entry["ac"]
+
+        # Antes de cualquier await: los cuerpos salen en el orden de la captura
+        body = self.data.body(entry)
+        if route.endswith("/auth/login") or route.endswith("/auth/register"):
+            body = self.data.login(entry.get("u"))
+        params = self.data.query(entry)
+        creates = created_key(entry)
+        if creates is not None and creates[1] == "upload":
+            body["totalChunks"] = self.upload_chunks.get(creates, 1)
+
+        content = None
+        media_type = (entry.get("ct") or "").split(";", 1)[0].strip().lower()
+        if body is not None and media_type in (MSGPACK, CBOR):
+            content = encode_content(body, media_type)
+            headers["Content-Type"] = media_type
+            body = None
+
+        response = None
+        try:
+            path = await self.path(entry)
+            if path is None:
+                self.unresolved += 1
+                return
+
+            key = f"{method} {route}"
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(
+                    method, path, params=params, json=body, content=content, headers=headers
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            self.latencies[key].append((time.perf_counter() - start) * 1000)
+            if status is None or status >= 500:
+                self.errors[key] += 1
+            if status != entry.get("s"):
+                self.status_mismatches[key] += 1
+        finally:
+            # Siempre se resuelve: los requests que usan el id no quedan esperando
+            if creates is not None:
+                real_id = None
+                if response is not None and response.status_code == 200:
+                    field = CREATE_ROUTES[(method, route)][1]
+                    real_id = response.json()["data"][field]
+                self._set_id(creates, real_id)
+
+    async def run(self, entries: list, speed: float):
+        origin = entries[0]["t"]
+        started = time.perf_counter()
+        tasks = []
+        for entry in entries:
+            delay = (entry["t"] - origin) / 1000 / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.send(entry)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    def report(self) -> list:
+        rows = []
+        for key, values in sorted(self.latencies.items()):
+            rows.append({
+                "route": key,
+                "requests": len(values),
+                "errors": self.errors[key],
+                "statusMismatches": self.status_mismatches[key],
+                "p50": round(percentile(values, 0.50), 2),
+                "p90": round(percentile(values, 0.90), 2),
+                "p99": round(percentile(values, 0.99), 2),
+                "max": round(max(values), 2)
+            })
+        return rows
+
+
+async def run(args) -> int:
+    entries = sorted(read_capture(args.capture), key=lambda entry: entry["t"])
+    if args.limit:
+        entries = entries[:args.limit]
+    selected = [entry for entry in entries if replayable(entry)]
+    print(f"📼 {len(entries)} requests capturados, {len(entries) - len(selected)} omitidos")
+    if not selected:
+        return 1
+
+    if args.in_process:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=60) as client:
+                replayer = Replayer(client, args.seed)
+                await replayer.setup(selected)
+                elapsed = await replayer.run(selected, args.speed)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            replayer = Replayer(client, args.seed)
+            await replayer.setup(selected)
+            elapsed = await replayer.run(selected, args.speed)
+
+    rows = replayer.report()
+    print(f"\n{len(selected)} requests en {elapsed:.1f}s (velocidad {args.speed}x)")
+    if replayer.unresolved:
+        print(f"⚠️ {replayer.unresolved} requests sin enviar: no se pudo crear el registro de su path")
+    print()
+    print(f"{'ruta':<44}{'reqs':>6}{'err':>5}{'≠status':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for row in rows:
+        print(
+            f"{row['route'][:43]:<44}{row['requests']:>6}{row['errors']:>5}{row['statusMismatches']:>8}"
+            f"{row['p50']:>9.1f}{row['p90']:>9.1f}{row['p99']:>9.1f}{row['max']:>9.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "speed": args.speed,
+                "seed": args.seed,
+                "elapsed": elapsed,
+                "unresolved": replayer.unresolved,
+                "routes": rows
+            }, f, indent=2)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("capture", help="archivo generado con CAPTURE_ENABLED=true")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:8000")
+    target.add_argument("--in-process", action="store_true", help="usar main.app sin levantar servidor")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = tiempos reales, 2 = el doble de rápido")
+    parser.add_argument("--limit", type=int, default=0, help="reproducir sólo los primeros N requests")
+    parser.add_argument("--seed", type=int, default=0, help="semilla de los datos sintéticos")
+    parser.add_argument("--json", help="guardar el reporte en este archivo")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
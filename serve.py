@@ -0,0 +1,45 @@
+"""
+Entry point de producción: varios workers uvicorn con uvloop + httptools.
+
+Uso:
+    python serve.py
+
+Variables de entorno: WEB_CONCURRENCY, MAX_REQUESTS, GRACEFUL_TIMEOUT_SECONDS,
+MONGODB_MAX_POOL_SIZE (ver .env.example).
+"""
+import os
+import uvicorn
+from app.config import settings
+
+
+def worker_count() -> int:
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    # Respetar los CPUs asignados al contenedor cuando es posible
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1
+
+
+def main():
+    workers = worker_count()
+    # Los workers leen WEB_CONCURRENCY para repartir el pool de MongoDB
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    print(f"🚀 Starting {workers} worker(s) on {settings.HOST}:{settings.PORT}")
+    uvicorn.run(
+        "main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        limit_max_requests=settings.MAX_REQUESTS or None,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT_SECONDS,
+        proxy_headers=True,
+        access_log=settings.ENVIRONMENT != "production"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import app.database as database
+from main import app
+
+
+class CountingCollection:
+    """Proxy de una colección que anota cada método llamado como "colección.método" """
+
+    def __init__(self, collection, calls: list):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._calls.append(f"{self._collection.name}.{name}")
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class CountingDatabase:
+    """Proxy de la base que devuelve colecciones contadas (db.x y db["x"])"""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls: list = []
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        return CountingCollection(self._db[name], self.calls)
+
+
+class BlockedCollection:
+    """Colección cuyas escrituras (insert_many, bulk_write) no terminan hasta que las cancelen"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def _block(self, *args, **kwargs):
+        self.started.set()
+        await asyncio.Event().wait()
+
+    insert_many = _block
+    bulk_write = _block
+
+
+class BlockedDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        return self._collections.setdefault(name, BlockedCollection())
+
+
+@pytest.fixture
+def blocked_db(monkeypatch):
+    """Base donde las escrituras quedan colgadas: para probar cancelaciones a mitad de flush"""
+    blocked = BlockedDatabase()
+    monkeypatch.setattr(database, "db", blocked)
+    return blocked
+
+
+@pytest.fixture
+def db(monkeypatch):
+    counting = CountingDatabase(AsyncMongoMockClient()["investment-tracker"])
+    # get_database() devuelve app.database.db
+    monkeypatch.setattr(database, "db", counting)
+    return counting
+
+
+@pytest.fixture
+def client(db):
+    # Sin lifespan: no arrancan las tareas de fondo ni la conexión real
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post("/api/auth/register", json={"email": "test@example.com", "password": "12345678"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['token']}"}
@@ -0,0 +1,24 @@
+import pytest
+
+STARTUP = {"requests": [
+    {"id": "status", "path": "/api/sync/status"},
+    {"id": "prefs", "path": "/api/user/preferences"},
+    {"id": "sites", "path": "/api/config/sites"},
+]}
+
+
+@pytest.mark.parametrize("path", ["/api/batch", "/api/batch/"])
+def test_batch_answers_without_redirect(client, auth_headers, path):
+    response = client.post(path, json=STARTUP, headers=auth_headers, follow_redirects=False)
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["responses"]] == ["status", "prefs", "sites"]
+    assert all(item["status"] == 200 for item in response.json()["responses"])
+
+
+def test_batch_resolves_auth_once(client, db, auth_headers):
+    db.calls.clear()
+
+    client.post("/api/batch", json=STARTUP, headers=auth_headers)
+
+    assert db.calls.count("users.find_one") == 1
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.utils import config_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    config_cache._entries.clear()
+    config_cache._size = 0
+    yield
+    config_cache._entries.clear()
+    config_cache._size = 0
+
+
+def read_sites(db, user: dict):
+    return asyncio.run(config_cache.get_config_sites(db, user))
+
+
+def test_serves_from_cache(db):
+    asyncio.run(db.config_sites.insert_one({"user_id": "u1", "name": "A"}))
+
+    read_sites(db, {"_id": "u1"})
+    db.calls.clear()
+    sites = read_sites(db, {"_id": "u1"})
+
+    assert [site["name"] for site in sites] == ["A"]
+    assert db.calls == []
+
+
+def test_write_in_another_worker_bumps_generation(db):
+    asyncio.run(db.users.insert_one({"_id": "u1"}))
+    asyncio.run(db.config_sites.insert_one({"user_id": "u1", "name": "A"}))
+    read_sites(db, {"_id": "u1"})
+
+    # Escritura hecha por otro worker: sólo comparten el documento del usuario
+    asyncio.run(db.config_sites.update_one({"user_id": "u1"}, {"$set": {"name": "B"}}))
+    asyncio.run(db.users.update_one({"_id": "u1"}, {"$inc": {config_cache.GENERATION_FIELD: 1}}))
+    user = asyncio.run(db.users.find_one({"_id": "u1"}))
+
+    assert [site["name"] for site in read_sites(db, user)] == ["B"]
+
+
+def test_local_entries_expire(db, monkeypatch):
+    asyncio.run(db.config_sites.insert_one({"user_id": "u1", "name": "A"}))
+    read_sites(db, {"_id": "u1"})
+    asyncio.run(db.config_sites.update_one({"user_id": "u1"}, {"$set": {"name": "B"}}))
+
+    now = config_cache.time.monotonic()
+    monkeypatch.setattr(config_cache.time, "monotonic", lambda: now + settings.CONFIG_CACHE_TTL_SECONDS + 1)
+
+    assert [site["name"] for site in read_sites(db, {"_id": "u1"})] == ["B"]
+
+
+def test_preferences_come_with_the_authenticated_user(client, db, auth_headers):
+    client.put("/api/user/preferences", json={"theme": "dark"}, headers=auth_headers)
+    db.calls.clear()
+
+    response = client.get("/api/user/preferences", headers=auth_headers)
+
+    assert response.json()["data"]["theme"] == "dark"
+    assert db.calls == ["users.find_one"]
+
+
+def test_site_writes_reach_cached_reads(client, db, auth_headers):
+    site = {"name": "A", "urlPattern": "https://a.example/*", "selectors": {"ars": ".s"}, "investment": "A"}
+    site_id = client.post("/api/config/sites", json=site, headers=auth_headers).json()["data"]["id"]
+    client.get("/api/config/sites", headers=auth_headers)
+
+    client.put(f"/api/config/sites/{site_id}", json={"name": "B"}, headers=auth_headers)
+    db.calls.clear()
+    response = client.get("/api/config/sites", headers=auth_headers)
+
+    assert [site["name"] for site in response.json()["data"]] == ["B"]
+    db.calls.clear()
+    client.get("/api/config/sites", headers=auth_headers)
+    assert db.calls == ["users.find_one"]
@@ -0,0 +1,45 @@
+import asyncio
+
+from app.config import settings
+from app.database import create_indexes
+
+
+class CollModDatabase:
+    """Base de mongomock que anota los comandos (mongomock no implementa collMod)"""
+
+    def __init__(self, db):
+        self._db = db
+        self.commands: list = []
+
+    def __getattr__(self, name):
+        return self._db[name]
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    async def command(self, command: dict):
+        self.commands.append(command)
+        # Emula collMod recreando el índice con el nuevo TTL
+        collection = self._db[command["collMod"]]
+        keys = list(command["index"]["keyPattern"].items())
+        await collection.drop_index(keys)
+        await collection.create_index(keys, expireAfterSeconds=command["index"]["expireAfterSeconds"])
+
+
+def test_changed_sync_log_ttl_is_updated_with_coll_mod(db, monkeypatch):
+    database = CollModDatabase(db)
+
+    async def run():
+        monkeypatch.setattr(settings, "SYNC_LOG_TTL_DAYS", 30)
+        await create_indexes(database)
+        monkeypatch.setattr(settings, "SYNC_LOG_TTL_DAYS", 7)
+        # Sin collMod, create_index fallaría con IndexOptionsConflict
+        await create_indexes(database)
+        await create_indexes(database)
+
+    asyncio.run(run())
+
+    assert database.commands == [{
+        "collMod": "sync_logs",
+        "index": {"keyPattern": {"timestamp": 1}, "expireAfterSeconds": 7 * 86400}
+    }]
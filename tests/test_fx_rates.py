@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.utils import fx_rates
+from app.utils.fx_rates import DAY_MS, backfill_valuations, load_fx_rates, store_fx_rates, valuations
+
+DAY_1 = 1704067200000  # 2024-01-01
+DAY_2 = DAY_1 + DAY_MS
+
+
+@pytest.fixture
+def rates(db, monkeypatch):
+    """Tabla con dos cotizaciones; se restaura la tabla vacía al terminar"""
+    monkeypatch.setattr(fx_rates, "_timestamps", [])
+    monkeypatch.setattr(fx_rates, "_rates", [])
+
+    async def run():
+        await store_fx_rates(db, [(DAY_1, 800.0), (DAY_2 + 3600000, 1000.0)])
+        return await load_fx_rates(db)
+
+    assert asyncio.run(run()) == 2
+
+
+def test_converts_with_the_rate_of_the_snapshot_day(rates):
+    # A mitad del segundo día vale la cotización publicada ese día
+    assert valuations({"timestamp": DAY_2 + 7200000, "monto_ars": 5000.0}) == {
+        "valor_ars": 5000.0, "valor_usd": 5.0, "fx_rate": 1000.0
+    }
+    assert valuations({"timestamp": DAY_1 + 7200000, "monto_usd": 2.0}) == {
+        "valor_ars": 1600.0, "valor_usd": 2.0, "fx_rate": 800.0
+    }
+
+
+def test_without_a_published_rate_keeps_only_the_own_amount(rates):
+    assert valuations({"timestamp": DAY_1 - 1, "monto_ars": 5000.0, "monto_usd": None}) == {
+        "valor_ars": 5000.0, "valor_usd": None, "fx_rate": None
+    }
+
+
+def test_backfill_fills_legacy_records_once(db, rates):
+    async def run():
+        await db.investments.insert_many([
+            {"user_id": "u1", "timestamp": DAY_1, "entidad": "A", "monto_ars": 800.0},
+            {
+                "user_id": "u1", "timestamp": DAY_2, "entidad": "A", "monto_ars": 800.0,
+                **valuations({"timestamp": DAY_2, "monto_ars": 800.0})
+            }
+        ])
+        first = await backfill_valuations(db, pause=0)
+        second = await backfill_valuations(db, pause=0)
+        legacy = await db.investments.find_one({"timestamp": DAY_1})
+        return first, second, legacy
+
+    first, second, legacy = asyncio.run(run())
+
+    assert first == {"scanned": 2, "updated": 1}
+    assert second == {"scanned": 2, "updated": 0}
+    assert (legacy["fx_rate"], legacy["valor_usd"]) == (800.0, 1.0)
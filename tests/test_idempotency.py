@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.idempotency import DONE, IN_PROGRESS, run_idempotent
+
+KEY = {"user_id": "u1", "path": "/api/sync/push", "key": "k1"}
+
+
+def counter():
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"success": True, "n": len(calls)}
+
+    return handler, calls
+
+
+def test_replays_stored_response(db):
+    handler, calls = counter()
+
+    async def run():
+        first = await run_idempotent(KEY, "f", handler)
+        second = await run_idempotent(KEY, "f", handler)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == ({"success": True, "n": 1}, False)
+    assert second == ({"success": True, "n": 1}, True)
+    assert len(calls) == 1
+
+
+def test_concurrent_duplicates_run_once(db):
+    handler, calls = counter()
+
+    async def slow():
+        await asyncio.sleep(0.1)
+        return await handler()
+
+    async def run():
+        return await asyncio.gather(*[run_idempotent(KEY, "f", slow) for _ in range(3)])
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True]
+
+
+def test_other_body_is_rejected(db):
+    handler, _ = counter()
+
+    async def run():
+        await run_idempotent(KEY, "f", handler)
+        await run_idempotent(KEY, "otro", handler)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 422
+
+
+def test_failed_run_releases_key(db):
+    handler, calls = counter()
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await run_idempotent(KEY, "f", failing)
+        return await run_idempotent(KEY, "f", handler)
+
+    assert asyncio.run(run()) == ({"success": True, "n": 1}, False)
+
+
+def test_takes_over_key_of_dead_worker(db):
+    handler, calls = counter()
+    now = datetime.utcnow()
+
+    async def run():
+        # Key tomada por un worker que murió sin terminar
+        await db.idempotency_keys.insert_one({
+            "_id": KEY,
+            "fingerprint": "f",
+            "status": IN_PROGRESS,
+            "locked_until": now - timedelta(seconds=1),
+            "expires_at": now + timedelta(days=1)
+        })
+        result = await run_idempotent(KEY, "f", handler)
+        stored = await db.idempotency_keys.find_one({"_id": KEY})
+        return result, stored
+
+    result, stored = asyncio.run(run())
+
+    assert result == ({"success": True, "n": 1}, False)
+    assert stored["status"] == DONE
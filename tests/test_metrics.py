@@ -0,0 +1,29 @@
+from app.config import settings
+
+
+def test_metrics_requires_credentials(client):
+    assert client.get("/metrics").status_code in (401, 403)
+
+
+def test_metrics_rejects_regular_users(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [])
+
+    assert client.get("/metrics", headers=auth_headers).status_code == 403
+
+
+def test_metrics_for_admins(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["test@example.com"])
+
+    response = client.get("/metrics", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert "counters" in response.json()
+
+
+def test_metrics_token(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scraper-secret")
+
+    assert client.get("/metrics", headers={"Authorization": "Bearer scraper-secret"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+    # Con el token no se busca ningún usuario
+    assert "users.find_one" not in db.calls
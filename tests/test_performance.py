@@ -0,0 +1,55 @@
+import asyncio
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.utils.performance import columns_from_groups, series_metrics
+
+HOUR_MS = 3600000
+
+
+def test_columns_are_sorted_by_timestamp():
+    columns = columns_from_groups([
+        {"_id": {"entidad": "A", "window": 1}, "timestamp": [30, 10], "monto_ars": [3.0, 1.0], "monto_usd": [None, 1.0]},
+        {"_id": {"entidad": "B", "window": 1}, "timestamp": [20], "monto_ars": [None], "monto_usd": [2.0]},
+    ])
+
+    assert columns["names"] == ["A", "B"]
+    assert columns["timestamp"].tolist() == [10, 20, 30]
+    assert columns["entidad"].tolist() == [0, 1, 0]
+    assert np.isnan(columns["monto_ars"][1])
+
+
+def test_short_history_has_no_overflow_warning():
+    timestamps = np.array([0, 2000, 4000], dtype=np.int64)
+    values = np.array([100.0, 150.0, 200.0])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        metrics = series_metrics(timestamps, values)
+
+    assert metrics["cagr"] is None
+    assert metrics["periodReturn"] == 1.0
+
+
+def test_cached_result_sees_writes_from_other_workers(client, db, auth_headers):
+    records = [
+        {"timestamp": 1700000000000 + i * HOUR_MS, "entidad": "A", "monto_ars": 100.0 + i, "monto_usd": None}
+        for i in range(3)
+    ]
+    client.post("/api/investments/bulk", json={"records": records}, headers=auth_headers)
+
+    first = client.get("/api/investments/performance", headers=auth_headers).json()["data"]
+
+    # Escritura hecha por otro worker: no pasa por invalidate_performance
+    user = asyncio.run(db.users.find_one({"email": "test@example.com"}))
+    asyncio.run(db.investments.update_one(
+        {"user_id": user["_id"], "timestamp": records[-1]["timestamp"]},
+        {"$set": {"monto_ars": 500.0, "updated_at": datetime.utcnow() + timedelta(seconds=1)}}
+    ))
+
+    second = client.get("/api/investments/performance", headers=auth_headers).json()["data"]
+
+    assert first["entities"]["A"]["ars"]["last"] == 102.0
+    assert second["entities"]["A"]["ars"]["last"] == 500.0
@@ -0,0 +1,430 @@
+"""
+Verifica con explain() que cada consulta de app/routers/* y app/utils/* use
+índices. Necesita un mongod descartable (mongomock no tiene planes de
+consulta): se saltea si no está TEST_MONGODB_URI.
+
+    TEST_MONGODB_URI=mongodb://localhost:27017 python -m pytest tests/test_query_plans.py
+
+Siembra la base DB_NAME, crea los índices de create_indexes() y corre cada
+forma de consulta. Falla ante COLLSCAN, un SORT en memoria sobre más de
+SORT_THRESHOLD documentos, un IXSCAN sobre un índice no declarado o más de
+MAX_EXAMINED_RATIO documentos examinados por documento devuelto.
+Los filtros y pipelines salen de los mismos helpers que usa la app; al
+agregar una consulta, agregar su forma a QUERY_SHAPES.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.database import create_indexes
+from app.routers.investments import AS_OF_SORT, as_of_filter, investment_filter
+from app.routers.sync import changed_since_filter, site_key_filter
+from app.utils.config_cache import GENERATION_FIELD
+from app.utils.fx_rates import BACKFILL_PROJECTION, VALUATION_STAGE
+from app.utils.idempotency import takeover_filter
+from app.utils.investment_writes import key_filter
+from app.utils.performance import columns_pipeline
+from app.utils.retention import ENABLED_USERS, bucket_delete_filter, buckets_pipeline, lease_filter
+from app.utils.write_batcher import LOOKUP_PROJECTION, lookup_query
+
+TEST_MONGODB_URI = os.environ.get("TEST_MONGODB_URI")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_MONGODB_URI,
+    reason="TEST_MONGODB_URI no configurada (requiere un mongod descartable)"
+)
+
+DB_NAME = "investment-tracker-query-plans"
+ENTIDADES = ["Banco Nación", "Banco Galicia", "Mercado Pago", "IOL", "Binance", "Plazo Fijo"]
+USERS = 3
+ROWS_PER_ENTITY = 500
+SORT_THRESHOLD = 100
+# Documentos examinados por devuelto (o escrito). Con el índice correcto
+# ronda 1; el mayor esperado es push config lookup (len(ENTIDADES) sitios)
+MAX_EXAMINED_RATIO = 10
+BASE_TS = 1704067200000
+DAY_MS = 86400000
+
+
+async def seed(db) -> dict:
+    """Siembra la base y devuelve los ids que usan las consultas"""
+    now = datetime.utcnow()
+    user_ids = []
+    for u in range(USERS):
+        user_id = ObjectId()
+        user_ids.append(user_id)
+        await db.users.insert_one({
+            "_id": user_id,
+            "email": f"plans{u}@example.com",
+            "preferences": {},
+            "retention": {"enabled": u % 2 == 0}
+        })
+
+        docs = []
+        for entidad in ENTIDADES:
+            for i in range(ROWS_PER_ENTITY):
+                updated = now - timedelta(minutes=random.randint(0, 60 * 24 * 90))
+                docs.append({
+                    "user_id": user_id,
+                    "timestamp": BASE_TS + i * 3600000,
+                    "entidad": entidad,
+                    "monto_ars": random.uniform(1000, 100000),
+                    "monto_usd": None,
+                    "fx_rate": 1000.0,
+                    "created_at": updated,
+                    "updated_at": updated
+                })
+        await db.investments.insert_many(docs)
+
+        await db.config_sites.insert_many([
+            {
+                "user_id": user_id,
+                "name": entidad,
+                "urlPattern": f"https://site{n}.example.com/*",
+                "selectors": {"ars": ".saldo"},
+                "investment": entidad,
+                "created_at": now,
+                "updated_at": now - timedelta(days=n)
+            }
+            for n, entidad in enumerate(ENTIDADES)
+        ])
+
+        await db.upload_sessions.insert_one({
+            "user_id": user_id,
+            "status": "open",
+            "total_chunks": 2,
+            "received": [0],
+            "counts": {},
+            "created_at": now,
+            "expires_at": now + timedelta(hours=1)
+        })
+        await db.idempotency_keys.insert_one({
+            "_id": {"user_id": str(user_id), "path": "/api/sync/push", "key": "k"},
+            "fingerprint": "f",
+            "status": "done",
+            "expires_at": now + timedelta(hours=1)
+        })
+
+    await db.fx_rates.insert_many([
+        {"timestamp": BASE_TS + i * DAY_MS, "ars_per_usd": 800.0 + i} for i in range(365)
+    ])
+    await db.locks.insert_one({"_id": "retention", "owner": "otro", "expires_at": now})
+
+    user_id = user_ids[0]
+    return {
+        "user_id": user_id,
+        "investment_id": (await db.investments.find_one({"user_id": user_id}))["_id"],
+        "site_id": (await db.config_sites.find_one({"user_id": user_id}))["_id"],
+        "upload_id": (await db.upload_sessions.find_one({"user_id": user_id}))["_id"],
+        "idempotency_key": {"user_id": str(user_id), "path": "/api/sync/push", "key": "k"},
+        "now": now,
+        "since": int((now - timedelta(days=7)).timestamp() * 1000)
+    }
+
+
+def _count(collection: str, query: dict) -> dict:
+    # count_documents() es una aggregation $match + $group
+    return {"aggregate": collection, "pipeline": [
+        {"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}
+    ], "cursor": {}}
+
+
+def _find_one(collection: str, query: dict, **options) -> dict:
+    return {"find": collection, "filter": query, "limit": 1, **options}
+
+
+def _update(collection: str, query: dict, update, upsert: bool = False) -> dict:
+    return {"update": collection, "updates": [{"q": query, "u": update, "upsert": upsert}]}
+
+
+def _delete(collection: str, query: dict, limit: int) -> dict:
+    return {"delete": collection, "deletes": [{"q": query, "limit": limit}]}
+
+
+def _aggregate(collection: str, pipeline: list) -> dict:
+    return {"aggregate": collection, "pipeline": pipeline, "cursor": {}, "allowDiskUse": True}
+
+
+def _by_key(user_id, timestamp: int = BASE_TS, entidad: str = "IOL") -> dict:
+    return key_filter(user_id, timestamp, entidad)
+
+
+# (nombre, colección, comando explain a partir de los ids sembrados, recorre
+# toda la colección a propósito). Las tareas de fondo que procesan todos los
+# usuarios son los únicos COLLSCAN esperados.
+QUERY_SHAPES = [
+    # middleware/auth.py, routers/auth.py
+    ("get_current_user", "users", lambda c: _find_one("users", {"_id": c["user_id"]}), False),
+    ("register / login", "users", lambda c: _find_one("users", {"email": "plans0@example.com"}), False),
+
+    # routers/investments.py
+    ("get_investments", "investments", lambda c: {
+        "find": "investments", "filter": investment_filter(c["user_id"]), "sort": {"timestamp": -1},
+        "skip": 100, "limit": 1000
+    }, False),
+    ("get_investments entity", "investments", lambda c: {
+        "find": "investments", "filter": investment_filter(c["user_id"], "IOL"), "sort": {"timestamp": -1},
+        "limit": 1000
+    }, False),
+    ("get_investments range", "investments", lambda c: {
+        "find": "investments",
+        "filter": investment_filter(c["user_id"], date_from=BASE_TS, date_to=BASE_TS + DAY_MS * 5),
+        "sort": {"timestamp": -1}, "limit": 1000
+    }, False),
+    ("get_investments count", "investments", lambda c: _count("investments", investment_filter(c["user_id"])), False),
+    ("as-of entidades", "investments", lambda c: {
+        "distinct": "investments", "key": "entidad", "query": {"user_id": c["user_id"]}
+    }, False),
+    ("as-of snapshot", "investments", lambda c: _find_one(
+        "investments", as_of_filter(c["user_id"], "IOL", BASE_TS + DAY_MS * 5), sort=dict(AS_OF_SORT)
+    ), False),
+    ("update_investment", "investments", lambda c: {
+        "findAndModify": "investments", "query": {"_id": c["investment_id"], "user_id": c["user_id"]},
+        "update": [{"$set": {"monto_ars": 1.0, "updated_at": c["now"]}}, VALUATION_STAGE], "new": True
+    }, False),
+    ("delete_investment", "investments", lambda c: _delete(
+        "investments", {"_id": c["investment_id"], "user_id": c["user_id"]}, 1
+    ), False),
+    ("delete_all_investments", "investments", lambda c: _delete("investments", {"user_id": c["user_id"]}, 0), False),
+
+    # utils/performance.py
+    ("load_columns", "investments", lambda c: _aggregate("investments", columns_pipeline(c["user_id"])), False),
+    ("data_version count", "investments", lambda c: _count("investments", {"user_id": c["user_id"]}), False),
+    ("data_version last", "investments", lambda c: _find_one(
+        "investments", {"user_id": c["user_id"]}, projection={"_id": 0, "updated_at": 1}, sort={"updated_at": -1}
+    ), False),
+
+    # utils/investment_writes.py, utils/write_batcher.py
+    ("upsert lookup", "investments", lambda c: _find_one("investments", _by_key(c["user_id"])), False),
+    ("upsert update", "investments", lambda c: _update(
+        "investments", {"_id": c["investment_id"]}, {"$set": {"monto_ars": 1.0}}
+    ), False),
+    ("write_batcher lookup", "investments", lambda c: {
+        "find": "investments",
+        "filter": lookup_query([(c["user_id"], BASE_TS + i * 3600000, entidad)
+                                for i in range(10) for entidad in ENTIDADES[:2]]),
+        "projection": LOOKUP_PROJECTION
+    }, False),
+    ("write_batcher upsert", "investments", lambda c: _update(
+        "investments", _by_key(c["user_id"], BASE_TS - 1),
+        {"$set": {"monto_ars": 1.0}, "$setOnInsert": {"created_at": c["now"]}}, upsert=True
+    ), False),
+    ("write_batcher resolve id", "investments", lambda c: _find_one(
+        "investments", _by_key(c["user_id"]), projection={"_id": 1}
+    ), False),
+
+    # routers/sync.py
+    ("get_sync_status investments", "investments", lambda c: _count("investments", {"user_id": c["user_id"]}), False),
+    ("get_sync_status config_sites", "config_sites", lambda c: _count("config_sites", {"user_id": c["user_id"]}), False),
+    ("get_sync_status last", "investments", lambda c: _find_one(
+        "investments", {"user_id": c["user_id"]}, sort={"updated_at": -1}
+    ), False),
+    ("push config lookup", "config_sites", lambda c: _find_one(
+        "config_sites", site_key_filter(c["user_id"], "IOL", "https://site3.example.com/*")
+    ), False),
+    ("push config update", "config_sites", lambda c: _update(
+        "config_sites", {"_id": c["site_id"]}, {"$set": {"investment": "IOL"}}
+    ), False),
+    ("push preferences", "users", lambda c: _update(
+        "users", {"_id": c["user_id"]}, {"$set": {"preferences": {}}}
+    ), False),
+    ("pull_sync investments", "investments", lambda c: {
+        "find": "investments", "filter": changed_since_filter(c["user_id"], c["since"]), "sort": {"updated_at": -1}
+    }, False),
+    ("pull_sync config_sites", "config_sites", lambda c: {
+        "find": "config_sites", "filter": changed_since_filter(c["user_id"], c["since"]), "sort": {"updated_at": -1}
+    }, False),
+    ("upload session lookup", "upload_sessions", lambda c: _find_one(
+        "upload_sessions", {"_id": c["upload_id"], "user_id": c["user_id"]}
+    ), False),
+    ("upload chunk received", "upload_sessions", lambda c: _update(
+        "upload_sessions", {"_id": c["upload_id"], "received": {"$ne": 1}},
+        {"$addToSet": {"received": 1}, "$inc": {"counts.created": 1}}
+    ), False),
+    ("upload commit", "upload_sessions", lambda c: _update(
+        "upload_sessions", {"_id": c["upload_id"]}, {"$set": {"status": "committed"}}
+    ), False),
+    ("export investments", "investments", lambda c: {
+        "find": "investments", "filter": {"user_id": c["user_id"]}, "sort": {"timestamp": -1}
+    }, False),
+    ("export config_sites", "config_sites", lambda c: {"find": "config_sites", "filter": {"user_id": c["user_id"]}}, False),
+    ("import replace config_sites", "config_sites", lambda c: _delete("config_sites", {"user_id": c["user_id"]}, 0), False),
+
+    # routers/config.py, utils/config_cache.py
+    ("get_config_sites", "config_sites", lambda c: {"find": "config_sites", "filter": {"user_id": c["user_id"]}}, False),
+    ("invalidate_config_cache", "users", lambda c: _update(
+        "users", {"_id": c["user_id"]}, {"$inc": {GENERATION_FIELD: 1}}
+    ), False),
+    ("update_config_site", "config_sites", lambda c: {
+        "findAndModify": "config_sites", "query": {"_id": c["site_id"], "user_id": c["user_id"]},
+        "update": {"$set": {"name": "IOL"}}, "new": True
+    }, False),
+    ("delete_config_site", "config_sites", lambda c: _delete(
+        "config_sites", {"_id": c["site_id"], "user_id": c["user_id"]}, 1
+    ), False),
+    ("update_preferences / retention", "users", lambda c: {
+        "findAndModify": "users", "query": {"_id": c["user_id"]},
+        "update": {"$set": {"preferences.theme": "dark"}}, "fields": {"preferences": 1}, "new": True
+    }, False),
+
+    # utils/idempotency.py
+    ("idempotency lookup", "idempotency_keys", lambda c: _find_one("idempotency_keys", {"_id": c["idempotency_key"]}), False),
+    ("idempotency takeover", "idempotency_keys", lambda c: {
+        "findAndModify": "idempotency_keys",
+        "query": takeover_filter(c["idempotency_key"], "f", c["now"]),
+        "update": {"$set": {"locked_until": c["now"]}}, "fields": {"_id": 1}, "new": True
+    }, False),
+    ("idempotency done", "idempotency_keys", lambda c: _update(
+        "idempotency_keys", {"_id": c["idempotency_key"]}, {"$set": {"status": "done"}}
+    ), False),
+    ("idempotency release", "idempotency_keys", lambda c: _delete(
+        "idempotency_keys", {"_id": c["idempotency_key"], "status": "in_progress"}, 1
+    ), False),
+
+    # utils/user_activity.py
+    ("last_login flush", "users", lambda c: _update(
+        "users", {"_id": c["user_id"]}, {"$set": {"last_login": c["now"]}}
+    ), False),
+
+    # utils/fx_rates.py
+    ("load_fx_rates", "fx_rates", lambda c: {
+        "find": "fx_rates", "filter": {}, "projection": {"_id": 0, "timestamp": 1, "ars_per_usd": 1},
+        "sort": {"timestamp": 1}
+    }, False),
+    ("fx_rates upsert", "fx_rates", lambda c: _update(
+        "fx_rates", {"timestamp": BASE_TS}, {"$set": {"ars_per_usd": 900.0}}, upsert=True
+    ), False),
+    ("backfill_valuations user", "investments", lambda c: {
+        "find": "investments", "filter": {"user_id": c["user_id"]}, "projection": BACKFILL_PROJECTION
+    }, False),
+    ("backfill_valuations all", "investments", lambda c: {
+        "find": "investments", "filter": {}, "projection": BACKFILL_PROJECTION
+    }, True),
+    ("backfill_valuations write", "investments", lambda c: _update(
+        "investments", {"_id": c["investment_id"]}, {"$set": {"valor_ars": 1.0}}
+    ), False),
+
+    # utils/retention.py
+    ("retention users", "users", lambda c: {
+        "find": "users", "filter": ENABLED_USERS, "projection": {"retention": 1}
+    }, True),
+    ("retention buckets", "investments", lambda c: _aggregate(
+        "investments", buckets_pipeline(c["user_id"], "day", BASE_TS, BASE_TS + DAY_MS * 10)
+    ), False),
+    ("retention delete", "investments", lambda c: _delete("investments", bucket_delete_filter(c["user_id"], {
+        "entidad": "IOL", "from": BASE_TS, "to": BASE_TS + DAY_MS, "keep": c["investment_id"]
+    }), 0), False),
+    ("retention lease", "locks", lambda c: _update(
+        "locks", lease_filter("yo", c["now"]), {"$set": {"owner": "yo"}}, upsert=True
+    ), False),
+]
+
+
+def walk(node, found: list):
+    """Junta todas las etapas (dicts con 'stage') del plan, sin importar el formato"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            found.append(node)
+        for value in node.values():
+            walk(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            walk(value, found)
+    return found
+
+
+def find_key(node, key):
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        for value in node.values():
+            result = find_key(value, key)
+            if result is not None:
+                return result
+    elif isinstance(node, list):
+        for value in node:
+            result = find_key(value, key)
+            if result is not None:
+                return result
+    return None
+
+
+async def check(db, declared: dict, collection: str, command: dict, full_scan: bool) -> list:
+    explain = await db.command("explain", command, verbosity="executionStats")
+
+    planner = find_key(explain, "winningPlan") or {}
+    stats = find_key(explain, "executionStats") or {}
+
+    problems = []
+    for stage in walk(planner, []):
+        kind = stage["stage"]
+        if kind == "COLLSCAN" and not full_scan:
+            problems.append("COLLSCAN")
+        if kind in ("IXSCAN", "EXPRESS_IXSCAN", "DISTINCT_SCAN", "COUNT_SCAN"):
+            key_pattern = tuple(stage.get("keyPattern", {}).items())
+            if key_pattern and key_pattern not in declared[collection]:
+                problems.append(f"índice no declarado {dict(key_pattern)}")
+    for stage in walk(stats.get("executionStages", {}), []):
+        if stage["stage"] == "SORT" and stage.get("nReturned", 0) > SORT_THRESHOLD:
+            problems.append(f"SORT en memoria de {stage['nReturned']} docs")
+
+    ratio = examined_ratio(stats)
+    if ratio > MAX_EXAMINED_RATIO:
+        problems.append(
+            f"examina {stats.get('totalDocsExamined', 0)} docs para devolver {returned(stats)} (ratio {ratio:.1f})"
+        )
+    return problems
+
+
+def returned(stats: dict) -> int:
+    """Documentos devueltos o, en escrituras, los que borraría/modificaría"""
+    written = [
+        stage.get(counter, 0)
+        for stage in walk(stats.get("executionStages", {}), [])
+        for counter in ("nWouldDelete", "nWouldModify")
+    ]
+    return max([stats.get("nReturned", 0), *written])
+
+
+def examined_ratio(stats: dict) -> float:
+    # Sin resultados, cada documento examinado cuenta como desperdiciado
+    examined = stats.get("totalDocsExamined", 0)
+    count = returned(stats)
+    return examined / count if count else float(examined)
+
+
+@pytest.fixture(scope="module")
+def plan_problems() -> dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(TEST_MONGODB_URI, serverSelectionTimeoutMS=5000)
+        await client.drop_database(DB_NAME)
+        db = client[DB_NAME]
+        try:
+            await create_indexes(db)
+            ids = await seed(db)
+
+            declared = {}
+            for collection in {shape[1] for shape in QUERY_SHAPES}:
+                info = await db[collection].index_information()
+                declared[collection] = {tuple(spec["key"]) for spec in info.values()}
+
+            return {
+                name: await check(db, declared, collection, build(ids), full_scan)
+                for name, collection, build, full_scan in QUERY_SHAPES
+            }
+        finally:
+            await client.drop_database(DB_NAME)
+            client.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("name", [shape[0] for shape in QUERY_SHAPES])
+def test_query_uses_index(plan_problems, name):
+    assert plan_problems[name] == []
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.config import settings
+from app.utils import retention
+from app.utils.retention import retention_policy
+
+
+def test_policy_disabled_when_server_switch_is_off(monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", False)
+
+    policy = retention_policy({"retention": {"enabled": True}})
+
+    assert policy["enabled"] is False
+    assert policy["userEnabled"] is True
+
+
+def test_policy_follows_user_choice_when_server_switch_is_on(monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", True)
+
+    assert retention_policy({})["enabled"] is True
+    assert retention_policy({"retention": {"enabled": False}})["enabled"] is False
+
+
+def test_retention_endpoint_reports_effective_policy(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", False)
+
+    response = client.get("/api/user/retention", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["enabled"] is False
+
+
+def one_bucket(db, user_id, unit, start_ms, end_ms):
+    # mongomock no tiene $dateTrunc/$bsonSize: un bucket fijo por tramo
+    async def buckets():
+        yield {"entidad": "A", "from": 0, "to": 1, "keep": None, "rows": 3, "bytes": 300}
+    return buckets()
+
+
+def test_report_estimates_while_server_switch_is_off(client, db, auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", False)
+    monkeypatch.setattr(retention, "_compactable_buckets", one_bucket)
+    db.calls.clear()
+
+    response = client.get("/api/user/retention/report", headers=auth_headers)
+
+    report = response.json()["data"]
+    assert report["rows"] > 0 and report["bytes"] > 0
+    assert report["policy"]["enabled"] is False
+    assert "investments.bulk_write" not in db.calls
+
+
+def test_compaction_does_nothing_while_server_switch_is_off(db, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_ENABLED", False)
+    monkeypatch.setattr(retention, "_compactable_buckets", one_bucket)
+
+    report = asyncio.run(retention.compact_user(db, {"_id": "u1"}))
+
+    assert report["rows"] == 0
+    assert db.calls == []
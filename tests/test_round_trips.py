@@ -0,0 +1,90 @@
+"""
+Regresión: cada endpoint de actualización hace un solo round trip a Mongo
+(además de la búsqueda del usuario autenticado).
+"""
+import asyncio
+
+AUTH_LOOKUP = "users.find_one"
+
+
+def insert(db, collection: str, document: dict):
+    asyncio.run(db[collection].insert_one(document))
+    return document["_id"]
+
+
+def user_id(db):
+    user = asyncio.run(db.users.find_one({"email": "test@example.com"}))
+    return user["_id"]
+
+
+def test_update_investment_single_round_trip(client, db, auth_headers):
+    investment_id = insert(db, "investments", {
+        "user_id": user_id(db),
+        "timestamp": 1700000000000,
+        "entidad": "Banco",
+        "monto_ars": 1000.0,
+        "monto_usd": None,
+        "fx_rate": 1000.0
+    })
+    db.calls.clear()
+
+    response = client.put(f"/api/investments/{investment_id}", json={"monto_ars": 2000.0}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["valor_usd"] == 2.0
+    assert db.calls == [AUTH_LOOKUP, "investments.find_one_and_update"]
+
+
+def test_update_investment_missing_record(client, db, auth_headers):
+    db.calls.clear()
+
+    response = client.put("/api/investments/" + "0" * 24, json={"monto_ars": 1.0}, headers=auth_headers)
+
+    assert response.status_code == 404
+    assert db.calls == [AUTH_LOOKUP, "investments.find_one_and_update"]
+
+
+def test_update_config_site_single_round_trip(client, db, auth_headers):
+    site_id = insert(db, "config_sites", {
+        "user_id": user_id(db),
+        "name": "Banco",
+        "urlPattern": "https://banco.example/*",
+        "selectors": {"ars": ".saldo", "usd": None},
+        "investment": "Cuenta"
+    })
+    db.calls.clear()
+
+    response = client.put(f"/api/config/sites/{site_id}", json={"name": "Otro banco"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["name"] == "Otro banco"
+    # Más el $inc de config_generation que invalida la cache en todos los workers
+    assert db.calls == [AUTH_LOOKUP, "config_sites.find_one_and_update", "users.update_one"]
+
+
+def test_update_preferences_single_round_trip(client, db, auth_headers):
+    db.calls.clear()
+
+    response = client.put("/api/user/preferences", json={"theme": "dark"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["theme"] == "dark"
+    assert db.calls == [AUTH_LOOKUP, "users.find_one_and_update"]
+
+
+def test_update_legacy_investment_single_round_trip(client, db, auth_headers):
+    # Sin fx_rate (escrito antes de guardarlo): lo completa scripts.fx_rates backfill
+    investment_id = insert(db, "investments", {
+        "user_id": user_id(db),
+        "timestamp": 1700000000000,
+        "entidad": "Banco",
+        "monto_ars": 1000.0,
+        "monto_usd": None
+    })
+    db.calls.clear()
+
+    response = client.put(f"/api/investments/{investment_id}", json={"monto_ars": 2000.0}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["valor_ars"] == 2000.0
+    assert db.calls == [AUTH_LOOKUP, "investments.find_one_and_update"]
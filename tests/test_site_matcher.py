@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.utils import site_matcher
+from app.utils.config_cache import GENERATION_FIELD
+
+SITE = {"name": "A", "urlPattern": "https://a.example/*", "selectors": {"ars": ".s"}, "investment": "A"}
+
+
+@pytest.fixture(autouse=True)
+def empty_matchers():
+    site_matcher._matchers.clear()
+    yield
+    site_matcher._matchers.clear()
+
+
+def match(client, auth_headers, url: str = "https://a.example/cuenta") -> list:
+    response = client.get("/api/config/sites/match", params={"url": url}, headers=auth_headers)
+    return [site["name"] for site in response.json()["data"]]
+
+
+def test_compiled_matcher_is_reused(client, db, auth_headers, monkeypatch):
+    client.post("/api/config/sites", json=SITE, headers=auth_headers)
+    match(client, auth_headers)
+
+    builds = []
+    monkeypatch.setattr(site_matcher, "SiteMatcher", lambda sites: builds.append(sites))
+    db.calls.clear()
+
+    assert match(client, auth_headers) == ["A"]
+    assert builds == []
+    assert db.calls == ["users.find_one"]
+
+
+def test_write_in_another_worker_rebuilds_matcher(client, db, auth_headers):
+    client.post("/api/config/sites", json=SITE, headers=auth_headers)
+    assert match(client, auth_headers) == ["A"]
+
+    # Otro worker: escribe y sube la generación, sin tocar la cache de éste
+    async def write():
+        await db.config_sites.update_one({"name": "A"}, {"$set": {"urlPattern": "https://b.example/*"}})
+        await db.users.update_one({"email": "test@example.com"}, {"$inc": {GENERATION_FIELD: 1}})
+    asyncio.run(write())
+
+    assert match(client, auth_headers) == []
+    assert match(client, auth_headers, "https://b.example/cuenta") == ["A"]
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(settings, "SITE_MATCHER_CACHE_SIZE", 2)
+
+    for user_id in ("u1", "u2", "u3"):
+        site_matcher.cache_matcher(user_id, [], generation=0)
+    site_matcher.invalidate_site_matcher("u3")
+
+    assert list(site_matcher._matchers) == ["u2"]
+    assert not hasattr(site_matcher, "_generations")
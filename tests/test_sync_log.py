@@ -0,0 +1,33 @@
+import asyncio
+
+from app.utils import sync_log
+
+
+def test_cancelled_flush_keeps_events(blocked_db):
+    sync_log._buffer.clear()
+
+    async def run():
+        sync_log.log_sync_event("u1", "push", 3)
+        sync_log.log_sync_event("u1", "pull", 0)
+        task = asyncio.create_task(sync_log.flush_sync_logs())
+        await blocked_db.sync_logs.started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert [event["action"] for event in sync_log._buffer] == ["push", "pull"]
+    sync_log._buffer.clear()
+
+
+def test_stop_writes_pending_events(db):
+    sync_log._buffer.clear()
+
+    async def run():
+        sync_log.start_sync_log_flusher()
+        sync_log.log_sync_event("u1", "push", 3)
+        await sync_log.stop_sync_log_flusher()
+        return await db.sync_logs.count_documents({})
+
+    assert asyncio.run(run()) == 1
+    assert not sync_log._buffer
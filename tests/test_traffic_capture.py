@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.middleware.capture import TrafficCaptureMiddleware
+from app.utils import traffic_capture
+from app.utils.traffic_capture import id_token
+from main import app
+from scripts.replay_traffic import Replayer, SyntheticData, replayable
+
+
+def capture(db, monkeypatch) -> tuple:
+    """Tráfico de un cliente: alta, modificación y baja por id, bulk y carga por chunks"""
+    monkeypatch.setattr(traffic_capture, "_buffer", traffic_capture.deque())
+    client = TestClient(TrafficCaptureMiddleware(app))
+    token = client.post(
+        "/api/auth/register", json={"email": "capture@example.com", "password": "12345678"}
+    ).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    investment_id = client.post(
+        "/api/investments/", json={"timestamp": 1, "entidad": "A", "monto_ars": 10.0}, headers=headers
+    ).json()["data"]["id"]
+    client.put(f"/api/investments/{investment_id}", json={"monto_ars": 20.0}, headers=headers)
+    client.delete(f"/api/investments/{investment_id}", headers=headers)
+    client.post(
+        "/api/investments/bulk",
+        json={"records": [{"timestamp": i, "entidad": "B", "monto_ars": 1.0} for i in range(3)]},
+        headers=headers
+    )
+    upload_id = client.post("/api/sync/uploads", json={"totalChunks": 2}, headers=headers).json()["data"]["uploadId"]
+    for index in range(2):
+        client.put(
+            f"/api/sync/uploads/{upload_id}/chunks/{index}",
+            json={"investments": [{"timestamp": 10 + index, "entidad": "C", "monto_ars": 1.0}]},
+            headers=headers
+        )
+    client.post(f"/api/sync/uploads/{upload_id}/commit", headers=headers)
+
+    return list(traffic_capture._buffer), investment_id
+
+
+def test_capture_hashes_path_ids(db, monkeypatch):
+    entries, investment_id = capture(db, monkeypatch)
+    by_route = {(entry["m"], entry["r"]): entry for entry in entries}
+
+    create = by_route[("POST", "/api/investments/")]
+    update = by_route[("PUT", "/api/investments/{investment_id}")]
+    assert create["c"] == id_token(investment_id)
+    assert update["p"] == {"investment_id": create["c"]}
+    assert investment_id not in str(entries)
+
+    chunk = by_route[("PUT", "/api/sync/uploads/{upload_id}/chunks/{index}")]
+    assert chunk["p"]["index"] == "1"
+    assert chunk["n"] == {"investments": 1}
+    assert by_route[("POST", "/api/investments/bulk")]["n"] == {"records": 3}
+
+
+def test_synthetic_data_is_deterministic():
+    entry = {"t": 1700000000000.0, "m": "POST", "r": "/api/investments/bulk", "n": {"records": 5}}
+
+    assert SyntheticData(7).body(entry) == SyntheticData(7).body(entry)
+    assert SyntheticData(7).body(entry) != SyntheticData(8).body(entry)
+
+
+def replay(entries: list) -> Replayer:
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            replayer = Replayer(client, seed=1)
+            await replayer.setup(entries)
+            await replayer.run(entries, speed=1000)
+            return replayer
+
+    return asyncio.run(run())
+
+
+def test_replay_resolves_path_ids(db, monkeypatch):
+    entries, _ = capture(db, monkeypatch)
+    entries = [entry for entry in entries if replayable(entry)]
+    assert any("{" in entry["r"] for entry in entries)
+
+    replayer = replay(entries)
+
+    assert replayer.unresolved == 0
+    assert sum(replayer.status_mismatches.values()) == 0
+    assert "PUT /api/investments/{investment_id}" in replayer.latencies
+
+
+def test_replay_seeds_records_created_before_capture(db, monkeypatch):
+    entries, _ = capture(db, monkeypatch)
+    # Sin las altas: los ids del path apuntan a registros previos a la captura
+    entries = [entry for entry in entries if replayable(entry) and "c" not in entry]
+
+    replayer = replay(entries)
+
+    assert replayer.unresolved == 0
+    assert sum(replayer.status_mismatches.values()) == 0
+    assert "POST /api/sync/uploads/{upload_id}/commit" in replayer.latencies
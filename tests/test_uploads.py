@@ -0,0 +1,51 @@
+import json
+
+from app.config import settings
+
+
+def open_upload(client, auth_headers) -> str:
+    response = client.post("/api/sync/uploads", json={"totalChunks": 2}, headers=auth_headers)
+    return response.json()["data"]["uploadId"]
+
+
+def chunk(records: int) -> dict:
+    return {"investments": [{"timestamp": i, "entidad": "A", "monto_ars": 1.0} for i in range(records)]}
+
+
+def test_chunk_is_stored(client, auth_headers):
+    upload_id = open_upload(client, auth_headers)
+
+    response = client.put(f"/api/sync/uploads/{upload_id}/chunks/0", json=chunk(5), headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.json()["data"]["investments"]["created"] == 5
+
+
+def test_oversized_chunk_rejected_by_content_length(client, auth_headers):
+    upload_id = open_upload(client, auth_headers)
+
+    body = json.dumps(chunk(1)).encode() + b" " * settings.UPLOAD_MAX_CHUNK_BYTES
+    response = client.put(
+        f"/api/sync/uploads/{upload_id}/chunks/0",
+        content=body,
+        headers={**auth_headers, "Content-Type": "application/json"}
+    )
+
+    assert response.status_code == 413
+
+
+def test_oversized_chunk_rejected_while_streaming(client, auth_headers):
+    upload_id = open_upload(client, auth_headers)
+
+    def body():
+        yield json.dumps(chunk(1)).encode()
+        for _ in range(settings.UPLOAD_MAX_CHUNK_BYTES // 65536 + 1):
+            yield b" " * 65536  # sin Content-Length
+
+    response = client.put(
+        f"/api/sync/uploads/{upload_id}/chunks/0",
+        content=body(),
+        headers={**auth_headers, "Content-Type": "application/json"}
+    )
+
+    assert response.status_code == 413
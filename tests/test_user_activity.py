@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime
+
+from app.utils import user_activity
+
+
+def test_cancelled_flush_requeues_activity(blocked_db):
+    user_activity._pending.clear()
+    login = datetime(2026, 1, 1)
+
+    async def run():
+        user_activity.record_user_activity("u1", last_login=login)
+        task = asyncio.create_task(user_activity.flush_user_activity())
+        await blocked_db.users.started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert user_activity._pending == {"u1": {"last_login": login}}
+    user_activity._pending.clear()
+
+
+def test_stop_writes_pending_activity(db):
+    user_activity._pending.clear()
+    login = datetime(2026, 1, 1)
+
+    async def run():
+        await db.users.insert_one({"_id": "u1", "email": "u1@example.com"})
+        user_activity.start_user_activity_flusher()
+        user_activity.record_user_activity("u1", last_login=login)
+        await user_activity.stop_user_activity_flusher()
+        return await db.users.find_one({"_id": "u1"})
+
+    assert asyncio.run(run())["last_login"] == login
+    assert not user_activity._pending
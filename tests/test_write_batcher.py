@@ -0,0 +1,102 @@
+import asyncio
+import gc
+
+from app.config import settings
+from app.utils import write_batcher
+from app.utils.investment_writes import CREATED, UPDATED
+
+USER_ID = "u1"
+
+
+def record(monto: float) -> dict:
+    return {"timestamp": 1, "entidad": "A", "monto_ars": monto}
+
+
+class StaleFind:
+    """investments cuyo find no ve lo que otro writer insertó después"""
+
+    def __init__(self, db):
+        self.investments = self
+        self._collection = db.investments
+
+    def find(self, *args, **kwargs):
+        return self._collection.find({"_id": None})
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def test_upsert_over_concurrent_insert_is_not_created(db):
+    async def run():
+        existing = await db.investments.insert_one({"user_id": USER_ID, **record(5.0)})
+        write = write_batcher._Write(USER_ID, record(10.0), asyncio.get_running_loop().create_future())
+        await write_batcher._apply(StaleFind(db), [write])
+        return existing.inserted_id, await write.future
+
+    existing_id, (outcome, investment_id) = asyncio.run(run())
+
+    assert outcome == UPDATED
+    assert investment_id == existing_id
+
+
+def test_new_record_is_created(db):
+    async def run():
+        write = write_batcher._Write(USER_ID, record(10.0), asyncio.get_running_loop().create_future())
+        await write_batcher._apply(db, [write])
+        return await write.future
+
+    outcome, investment_id = asyncio.run(run())
+
+    assert outcome == CREATED
+    assert investment_id is not None
+
+
+def test_flushes_of_the_same_key_apply_in_order(db, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_BATCH_MAX_RECORDS", 1)
+    applied = []
+
+    async def slow_first(db, batch):
+        monto = batch[0].record["monto_ars"]
+        if monto == 1.0:
+            await asyncio.sleep(0.05)
+        applied.append(monto)
+        for write in batch:
+            write_batcher._resolve(write, (UPDATED, None))
+
+    monkeypatch.setattr(write_batcher, "_apply", slow_first)
+
+    async def run():
+        await asyncio.gather(
+            write_batcher.submit_investment(USER_ID, record(1.0)),
+            write_batcher.submit_investment(USER_ID, record(2.0))
+        )
+
+    asyncio.run(run())
+
+    assert applied == [1.0, 2.0]
+    assert write_batcher._inflight == {}
+
+
+def test_cancelled_caller_does_not_leak_flush_error(db, monkeypatch):
+    monkeypatch.setattr(settings, "WRITE_BATCH_MAX_RECORDS", 1)
+
+    async def failing(db, batch):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("mongo caído")
+
+    monkeypatch.setattr(write_batcher, "_apply", failing)
+
+    errors = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context["message"]))
+        task = asyncio.create_task(write_batcher.submit_investment(USER_ID, record(1.0)))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, *write_batcher._flushes, return_exceptions=True)
+
+    asyncio.run(run())
+    # El aviso sale al destruirse el future, cuando ya nadie lo referencia
+    gc.collect()
+
+    assert errors == []